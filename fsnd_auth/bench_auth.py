@@ -0,0 +1,66 @@
+'''
+bench_auth.py
+    latency of requires_auth with and without the verified token cache
+    tokens are signed with the throwaway key pair of tests/keys, so it runs offline
+
+    python bench_auth.py [--requests 2000] [--tokens 1]
+        --tokens spreads the requests over that many distinct tokens
+'''
+import argparse
+import os
+import sys
+import time
+
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests'))
+
+from fsnd_auth import Auth, PEMKeySource, TokenCache  # noqa: E402
+from test_auth import AUDIENCE, DOMAIN, KEYS_DIR, sign  # noqa: E402
+
+
+def build_app(token_cache):
+    auth = Auth(DOMAIN, AUDIENCE, key_source=PEMKeySource(os.path.join(KEYS_DIR, 'public.pem')),
+                token_cache=token_cache)
+    app = Flask(__name__)
+
+    @app.route('/drinks')
+    @auth.requires_auth('post:drinks')
+    def drinks():
+        return 'ok'
+
+    return app, auth
+
+
+def run(label, token_cache, tokens, requests):
+    app, auth = build_app(token_cache)
+    client = app.test_client()
+    headers = [{'Authorization': 'Bearer ' + token} for token in tokens]
+
+    start = time.perf_counter()
+    for i in range(requests):
+        response = client.get('/drinks', headers=headers[i % len(headers)])
+        assert response.status_code == 200, response.data
+    elapsed = time.perf_counter() - start
+
+    stages = auth.stats()['stages']
+    print('{:<10} {:>9.1f} µs/request  decode: {:>5} calls {:>7.1f} µs mean'.format(
+        label, elapsed / requests * 1e6,
+        stages.get('decode', {}).get('count', 0), stages.get('decode', {}).get('mean_ms', 0) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--tokens', type=int, default=1)
+    args = parser.parse_args()
+
+    tokens = [sign(['post:drinks'], expires_in=3600 + i) for i in range(args.tokens)]
+    print('{} requests over {} tokens'.format(args.requests, args.tokens))
+    # a cache that holds nothing verifies every request
+    run('uncached', TokenCache(max_entries=0), tokens, args.requests)
+    run('cached', TokenCache(), tokens, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+from .errors import AuthError
+from .keys import JWKSKeySource, PEMKeySource, jwks_key_source
+from .tokens import TokenCache
+from .permissions import Permissions, Requirement, check_permissions
+from .auth import Auth, LatencyStats, get_token_auth_header
@@ -0,0 +1,216 @@
+import threading
+import time
+from functools import wraps
+
+from flask import request
+from jose import jwt
+
+from .errors import AuthError
+from .keys import jwks_key_source
+from .permissions import Permissions, Requirement, check_permissions
+from .tokens import TokenCache
+
+## Auth Header
+
+
+def get_token_auth_header():
+    """Obtains the Access Token from the Authorization Header
+    """
+    auth = request.headers.get('Authorization', None)
+    if not auth:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    parts = auth.split()
+    if parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer".'
+        }, 401)
+
+    elif len(parts) == 1:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Token not found.'
+        }, 401)
+
+    elif len(parts) > 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must be bearer token.'
+        }, 401)
+
+    token = parts[1]
+    return token
+
+
+## Latency Counters
+
+'''
+LatencyStats
+    count, total and worst seconds spent in every verification stage
+        header: reading the bearer token
+        cache: looking the token up in the TokenCache
+        key: resolving the signing key
+        decode: verifying the signature and the claims
+        permissions: checking the route requirements
+    failed attempts are counted too, a stage that raised is still timed
+'''
+
+
+class LatencyStats:
+    def __init__(self):
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            count, total, worst = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (count + 1, total + seconds, max(worst, seconds))
+
+    def timed(self, stage, f, *args):
+        start = time.perf_counter()
+        try:
+            return f(*args)
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self.lock:
+            return {stage: {
+                'count': count,
+                'total_ms': total * 1000,
+                'mean_ms': total * 1000 / count,
+                'max_ms': worst * 1000
+            } for stage, (count, total, worst) in self.stages.items()}
+
+
+## Auth
+
+'''
+Auth(domain, audience, issuer, key_source, algorithms)
+    the token verification of one app
+    issuer defaults to the Auth0 tenant of domain
+    key_source defaults to the JWKS of domain, shared with other apps trusting the same tenant
+    verified tokens are cached per Auth, so a token is only accepted for its own audience
+
+    requires_auth(*permissions, pass_payload=False)
+        all permissions are required, they are resolved when the route is decorated
+        with pass_payload the decoded payload is the first argument of the view
+'''
+
+
+class Auth:
+    def __init__(self, domain=None, audience=None, issuer=None, key_source=None,
+                 algorithms=('RS256',), token_cache=None):
+        if key_source is None and domain is None:
+            raise ValueError('Auth needs a domain or a key_source')
+
+        self.audience = audience
+        self.issuer = issuer or (f'https://{domain}/' if domain else None)
+        self.key_source = key_source or jwks_key_source(f'https://{domain}/.well-known/jwks.json')
+        self.algorithms = list(algorithms)
+        self.token_cache = token_cache or TokenCache()
+        self.latency = LatencyStats()
+
+    def get_token_auth_header(self):
+        return self.latency.timed('header', get_token_auth_header)
+
+    def get_signing_key(self, token):
+        try:
+            unverified_header = jwt.get_unverified_header(token)
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+
+        if 'kid' not in unverified_header and self.key_source.requires_kid:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Authorization malformed.'
+            }, 401)
+
+        try:
+            key = self.key_source.get_key(unverified_header.get('kid'))
+        except Exception:
+            raise AuthError({
+                'code': 'jwks_unavailable',
+                'description': 'Unable to fetch the signing keys.'
+            }, 401)
+
+        if key is None:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to find the appropriate key.'
+            }, 400)
+        return key
+
+    def decode(self, token, key):
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer
+            )
+
+        except jwt.ExpiredSignatureError:
+            raise AuthError({
+                'code': 'token_expired',
+                'description': 'Token expired.'
+            }, 401)
+
+        except jwt.JWTClaimsError:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Incorrect claims. '
+                               'Please, check the audience and issuer.'
+            }, 401)
+
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+
+    def verify_decode_jwt(self, token):
+        key = self.latency.timed('key', self.get_signing_key, token)
+        return self.latency.timed('decode', self.decode, token, key)
+
+    def verify(self, token):
+        entry = self.latency.timed('cache', self.token_cache.get, token)
+        if entry is None:
+            payload = self.verify_decode_jwt(token)
+            entry = (payload, Permissions(payload.get('permissions', [])))
+            self.token_cache.set(token, *entry)
+        return entry
+
+    def check_requirements(self, requirements, payload, granted):
+        for requirement in requirements:
+            check_permissions(requirement, payload, granted)
+
+    def requires_auth(self, *permissions, pass_payload=False):
+        requirements = [Requirement(permission) for permission in permissions if permission]
+
+        def requires_auth_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                token = self.get_token_auth_header()
+                payload, granted = self.verify(token)
+                self.latency.timed('permissions', self.check_requirements, requirements, payload, granted)
+                if pass_payload:
+                    return f(payload, *args, **kwargs)
+                return f(*args, **kwargs)
+
+            return wrapper
+        return requires_auth_decorator
+
+    def stats(self):
+        return {
+            'stages': self.latency.snapshot(),
+            'token_cache': self.token_cache.stats()
+        }
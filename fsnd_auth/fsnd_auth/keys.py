@@ -0,0 +1,177 @@
+import json
+import re
+import threading
+import time
+from urllib.request import urlopen
+
+## Key Sources
+
+'''
+A key source resolves the kid of a token header to the key that verifies it
+    get_key(kid) returns a key jose can decode with, None for an unknown kid
+    it raises when no key can be obtained at all
+    requires_kid tells whether tokens without a kid can be verified
+'''
+
+JWKS_DEFAULT_MAX_AGE = 600
+JWKS_REFRESH_RATIO = 0.8
+JWKS_MIN_REFETCH_INTERVAL = 30
+JWKS_RETRY_INTERVAL = 5
+JWKS_MAX_RETRY_INTERVAL = 300
+JWKS_TIMEOUT = 5
+
+'''
+JWKSKeySource
+    signing keys of a JWKS endpoint by kid, kept for the Cache-Control max-age of the response
+    past JWKS_REFRESH_RATIO of that age the next lookup refreshes them in a background thread
+    an unknown kid refetches at most once every JWKS_MIN_REFETCH_INTERVAL seconds (key rotation)
+    a failed fetch backs off, from JWKS_RETRY_INTERVAL doubling up to JWKS_MAX_RETRY_INTERVAL,
+    and meanwhile the previous keys keep being served
+    only one thread fetches at a time, the others serve the previous keys instead of waiting,
+    unless there are none yet
+    the url can point to a local stub server in tests
+'''
+
+
+class JWKSKeySource:
+    requires_kid = True
+
+    def __init__(self, url):
+        self.url = url
+        self.keys = {}
+        self.expires_at = 0
+        self.refresh_at = 0
+        self.fetched_at = None
+        self.retry_at = 0
+        self.failures = 0
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.Lock()
+
+    def fetch(self):
+        response = urlopen(self.url, timeout=JWKS_TIMEOUT)
+        jwks = json.loads(response.read())
+
+        max_age = JWKS_DEFAULT_MAX_AGE
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', '') or '')
+        if match:
+            max_age = int(match.group(1))
+
+        now = time.monotonic()
+        with self.lock:
+            self.keys = {key['kid']: {
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key.get('use'),
+                'n': key['n'],
+                'e': key['e']
+            } for key in jwks['keys'] if 'kid' in key and key.get('kty') == 'RSA'}
+            self.fetched_at = now
+            self.expires_at = now + max_age
+            self.refresh_at = now + max_age * JWKS_REFRESH_RATIO
+            self.failures = 0
+
+    def fetch_or_back_off(self):
+        try:
+            self.fetch()
+        except Exception:
+            with self.lock:
+                self.failures += 1
+                backoff = min(JWKS_RETRY_INTERVAL * 2 ** (self.failures - 1), JWKS_MAX_RETRY_INTERVAL)
+                self.retry_at = time.monotonic() + backoff
+            raise
+
+    '''
+    fetch_once(stale)
+        fetches unless another thread is already at it or the last failure is still backing off
+        with stale keys at hand, a busy fetch is not waited for
+        returns whether the keys are usable, raises when a fetch without keys to fall back on failed
+    '''
+    def fetch_once(self, stale):
+        if not self.fetch_lock.acquire(blocking=not stale):
+            return stale
+        try:
+            now = time.monotonic()
+            if self.fetched_at is not None and now < self.expires_at:
+                # fetched by the thread we waited for
+                return True
+            if now < self.retry_at:
+                return stale
+            try:
+                self.fetch_or_back_off()
+            except Exception:
+                if not stale:
+                    raise
+            return True
+        finally:
+            self.fetch_lock.release()
+
+    def refresh(self):
+        try:
+            with self.fetch_lock:
+                self.fetch_or_back_off()
+        except Exception:
+            pass
+        finally:
+            self.refreshing = False
+
+    def get_key(self, kid):
+        now = time.monotonic()
+        if self.fetched_at is None or now >= self.expires_at:
+            if not self.fetch_once(stale=self.fetched_at is not None) and self.fetched_at is None:
+                raise LookupError('JWKS unavailable, retrying in {:.0f}s'.format(self.retry_at - now))
+        elif now >= self.refresh_at and now >= self.retry_at and not self.refreshing:
+            with self.lock:
+                start, self.refreshing = not self.refreshing, True
+            if start:
+                threading.Thread(target=self.refresh, daemon=True).start()
+
+        key = self.keys.get(kid)
+        if key is None and now - self.fetched_at >= JWKS_MIN_REFETCH_INTERVAL and now >= self.retry_at:
+            # a rotated key, a failure here leaves the kid unknown
+            if self.fetch_lock.acquire(blocking=False):
+                try:
+                    self.fetch_or_back_off()
+                except Exception:
+                    pass
+                finally:
+                    self.fetch_lock.release()
+            key = self.keys.get(kid)
+        return key
+
+
+jwks_key_sources = {}
+jwks_key_sources_lock = threading.Lock()
+
+'''
+jwks_key_source(url)
+    the JWKSKeySource of a url, shared by every app of the process that trusts it
+'''
+
+
+def jwks_key_source(url):
+    with jwks_key_sources_lock:
+        if url not in jwks_key_sources:
+            jwks_key_sources[url] = JWKSKeySource(url)
+        return jwks_key_sources[url]
+
+
+'''
+PEMKeySource
+    a public key read once from a PEM file, for offline development and tests
+    with a kid it only verifies tokens signed under that kid, otherwise any token
+'''
+
+
+class PEMKeySource:
+    requires_kid = False
+
+    def __init__(self, path, kid=None):
+        with open(path) as pem:
+            self.key = pem.read()
+        self.kid = kid
+
+    def get_key(self, kid):
+        if self.kid is not None and kid != self.kid:
+            return None
+        return self.key
@@ -0,0 +1,69 @@
+from .errors import AuthError
+
+## Permissions
+
+'''
+Permissions
+    the permissions claim of a token compiled once into sets
+    a granted '*:drinks' or 'post:*' covers every permission it matches
+
+Requirement
+    a permission a route requires, resolved when the route is decorated
+    '*:drinks' requires any permission on drinks, 'post:*' any post permission
+'''
+
+
+class Permissions:
+    def __init__(self, permissions):
+        self.granted = frozenset(permissions)
+        self.actions = frozenset(permission.partition(':')[0] for permission in self.granted)
+        self.resources = frozenset(permission.partition(':')[2] for permission in self.granted)
+
+
+class Requirement:
+    def __init__(self, permission):
+        action, _, resource = permission.partition(':')
+        self.permission = permission
+        self.action = action if action != '*' else None
+        self.resource = resource if resource != '*' else None
+        # granted permissions that satisfy an exact requirement
+        self.grants = (permission, '*:' + resource, action + ':*', '*:*')
+
+    def satisfied_by(self, permissions):
+        if self.action is None and self.resource is None:
+            return bool(permissions.granted)
+        if self.action is None:
+            return not permissions.resources.isdisjoint((self.resource, '*'))
+        if self.resource is None:
+            return not permissions.actions.isdisjoint((self.action, '*'))
+        return not permissions.granted.isdisjoint(self.grants)
+
+
+'''
+check_permissions(permission, payload, permissions)
+    permission: string permission (i.e. 'post:drinks') or a Requirement
+    payload: decoded jwt payload
+    permissions: the payload permissions already compiled, if cached
+
+    raises an AuthError if the payload has no permissions or none satisfies the requirement
+'''
+
+
+def check_permissions(permission, payload, permissions=None):
+    if 'permissions' not in payload:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Permissions not included in JWT.'
+        }, 400)
+
+    if permissions is None:
+        permissions = Permissions(payload['permissions'])
+    if not isinstance(permission, Requirement):
+        permission = Requirement(permission)
+
+    if not permission.satisfied_by(permissions):
+        raise AuthError({
+            'code': 'unauthorized',
+            'description': 'Permission not found.'
+        }, 403)
+    return True
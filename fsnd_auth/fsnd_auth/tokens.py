@@ -0,0 +1,61 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+## Verified Token Cache
+
+'''
+TokenCache
+    decoded payloads of already verified tokens, with their compiled Permissions,
+    keyed by the sha256 of the token
+    an entry is dropped at the token's exp, the least recently used goes once full
+    stats() exposes the hit and miss counters
+'''
+
+TOKEN_CACHE_SIZE = 4096
+
+
+class TokenCache:
+    def __init__(self, max_entries=TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        key = hashlib.sha256(token.encode()).digest()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0].get('exp', 0) <= time.time():
+                del self.entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, token, payload, permissions):
+        # tokens without exp are never cached
+        if 'exp' not in payload:
+            return
+
+        key = hashlib.sha256(token.encode()).digest()
+        with self.lock:
+            self.entries[key] = (payload, permissions)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries)
+            }
@@ -0,0 +1,10 @@
+from setuptools import setup
+
+setup(
+    name='fsnd-auth',
+    version='0.1.0',
+    description='Auth0 token verification shared by the BasicFlaskAuth and coffee shop apps',
+    packages=['fsnd_auth'],
+    # jose comes from python-jose or python-jose-cryptodome, each app pins its own
+    install_requires=['Flask'],
+)
@@ -0,0 +1,170 @@
+import os
+import time
+import unittest
+
+from flask import Flask, jsonify
+from jose import jwt
+
+from fsnd_auth import Auth, AuthError, PEMKeySource, Permissions, Requirement, TokenCache
+
+KEYS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keys')
+DOMAIN = 'fsnd.test'
+AUDIENCE = 'coffee'
+
+
+def sign(permissions=('get:drinks',), audience=AUDIENCE, expires_in=3600):
+    with open(os.path.join(KEYS_DIR, 'private.pem')) as pem:
+        private_key = pem.read()
+    return jwt.encode({
+        'iss': 'https://{}/'.format(DOMAIN),
+        'aud': audience,
+        'sub': 'auth0|test',
+        'exp': int(time.time()) + expires_in,
+        'permissions': list(permissions)
+    }, private_key, algorithm='RS256')
+
+
+class RequirementTestCase(unittest.TestCase):
+    """This class represents the permission matching test case"""
+
+    def assertSatisfied(self, required, granted):
+        self.assertTrue(Requirement(required).satisfied_by(Permissions(granted)),
+                        '{} should satisfy {}'.format(granted, required))
+
+    def assertNotSatisfied(self, required, granted):
+        self.assertFalse(Requirement(required).satisfied_by(Permissions(granted)),
+                         '{} should not satisfy {}'.format(granted, required))
+
+    def test_when_exact_permission_granted_then_satisfied(self):
+        self.assertSatisfied('post:drinks', ['post:drinks'])
+        self.assertNotSatisfied('post:drinks', ['get:drinks'])
+        self.assertNotSatisfied('post:drinks', [])
+
+    def test_when_wildcard_granted_then_matching_requirements_satisfied(self):
+        self.assertSatisfied('post:drinks', ['*:drinks'])
+        self.assertSatisfied('post:drinks', ['post:*'])
+        self.assertSatisfied('post:drinks', ['*:*'])
+        self.assertNotSatisfied('post:drinks', ['*:categories'])
+        self.assertNotSatisfied('post:drinks', ['delete:*'])
+
+    def test_when_wildcard_required_then_any_matching_grant_satisfies(self):
+        self.assertSatisfied('*:drinks', ['delete:drinks'])
+        self.assertSatisfied('post:*', ['post:categories'])
+        self.assertSatisfied('*:*', ['get:drinks'])
+        self.assertSatisfied('*:drinks', ['get:*'])
+        self.assertNotSatisfied('*:drinks', ['get:categories'])
+        self.assertNotSatisfied('post:*', ['get:drinks'])
+        self.assertNotSatisfied('*:*', [])
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    def test_when_token_cached_then_hit(self):
+        cache = TokenCache()
+        payload = {'exp': time.time() + 60}
+        cache.set('token', payload, Permissions([]))
+
+        self.assertEqual(payload, cache.get('token')[0])
+        self.assertEqual({'hits': 1, 'misses': 0, 'size': 1}, cache.stats())
+
+    def test_when_token_expired_then_miss_and_dropped(self):
+        cache = TokenCache()
+        cache.set('token', {'exp': time.time() - 1}, Permissions([]))
+
+        self.assertIsNone(cache.get('token'))
+        self.assertEqual({'hits': 0, 'misses': 1, 'size': 0}, cache.stats())
+
+    def test_when_token_without_exp_then_not_cached(self):
+        cache = TokenCache()
+        cache.set('token', {}, Permissions([]))
+
+        self.assertIsNone(cache.get('token'))
+
+    def test_when_full_then_least_recently_used_evicted(self):
+        cache = TokenCache(max_entries=2)
+        payload = {'exp': time.time() + 60}
+        cache.set('first', payload, Permissions([]))
+        cache.set('second', payload, Permissions([]))
+        cache.get('first')
+        cache.set('third', payload, Permissions([]))
+
+        self.assertIsNotNone(cache.get('first'))
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('third'))
+
+
+class RequiresAuthTestCase(unittest.TestCase):
+    """This class represents the requires_auth test case, against tokens signed with tests/keys"""
+
+    def setUp(self):
+        self.auth = Auth(DOMAIN, AUDIENCE, key_source=PEMKeySource(os.path.join(KEYS_DIR, 'public.pem')))
+        self.app = Flask(__name__)
+
+        @self.app.route('/drinks')
+        @self.auth.requires_auth('post:drinks')
+        def drinks():
+            return 'ok'
+
+        @self.app.route('/me')
+        @self.auth.requires_auth(pass_payload=True)
+        def me(payload):
+            return payload['sub']
+
+        @self.app.errorhandler(AuthError)
+        def auth_error(error):
+            return jsonify(error.error), error.status_code
+
+        self.client = self.app.test_client
+
+    def get(self, path, token):
+        return self.client().get(path, headers={'Authorization': 'Bearer ' + token})
+
+    def test_when_permission_granted_then_200(self):
+        res = self.get('/drinks', sign(['post:drinks']))
+
+        self.assertEqual(200, res.status_code)
+
+    def test_when_payload_passed_then_view_receives_it(self):
+        res = self.get('/me', sign([]))
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(b'auth0|test', res.data)
+
+    def test_when_permission_missing_then_403(self):
+        res = self.get('/drinks', sign(['get:drinks']))
+
+        self.assertEqual(403, res.status_code)
+        self.assertEqual('unauthorized', res.get_json()['code'])
+
+    def test_when_header_missing_then_401(self):
+        res = self.client().get('/drinks')
+
+        self.assertEqual(401, res.status_code)
+        self.assertEqual('authorization_header_missing', res.get_json()['code'])
+
+    def test_when_token_expired_then_401(self):
+        res = self.get('/drinks', sign(['post:drinks'], expires_in=-60))
+
+        self.assertEqual(401, res.status_code)
+        self.assertEqual('token_expired', res.get_json()['code'])
+
+    def test_when_other_audience_then_401(self):
+        res = self.get('/drinks', sign(['post:drinks'], audience='default'))
+
+        self.assertEqual(401, res.status_code)
+        self.assertEqual('invalid_claims', res.get_json()['code'])
+
+    def test_when_token_reused_then_served_from_cache(self):
+        token = sign(['post:drinks'])
+        self.get('/drinks', token)
+        res = self.get('/drinks', token)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(1, self.auth.token_cache.stats()['hits'])
+        self.assertEqual(1, self.auth.stats()['stages']['decode']['count'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from jose import jwk
+
+from fsnd_auth import JWKSKeySource
+from fsnd_auth import keys
+
+KEYS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keys')
+KID = 'test-key'
+
+
+def public_jwk(kid):
+    with open(os.path.join(KEYS_DIR, 'public.pem')) as pem:
+        key = jwk.construct(pem.read(), 'RS256').to_dict()
+    return dict(key, kid=kid, use='sig')
+
+
+class StubJWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.down:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        body = json.dumps({'keys': [public_jwk(kid) for kid in self.server.kids]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if self.server.max_age is not None:
+            self.send_header('Cache-Control', 'public, max-age={}'.format(self.server.max_age))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Clock:
+    """Stands in for the time module of fsnd_auth.keys, so the tests move time by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class JWKSKeySourceTestCase(unittest.TestCase):
+    """This class represents the JWKS key source test case, against a local stub JWKS server"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubJWKSHandler)
+        self.server.requests, self.server.down, self.server.kids, self.server.max_age = 0, False, [KID], 100
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.clock = Clock()
+        patcher = mock.patch.object(keys, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.source = JWKSKeySource('http://127.0.0.1:{}/.well-known/jwks.json'.format(self.server.server_port))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def advance(self, seconds):
+        self.clock.now += seconds
+
+    def wait_for_refresh(self):
+        deadline = time.monotonic() + 5
+        while self.source.refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.source.refreshing)
+
+    def test_when_keys_within_max_age_then_served_without_fetching(self):
+        self.assertEqual(KID, self.source.get_key(KID)['kid'])
+        self.advance(79)
+        self.assertEqual(KID, self.source.get_key(KID)['kid'])
+
+        self.assertEqual(1, self.server.requests)
+
+    def test_when_max_age_passed_then_fetched_again(self):
+        self.source.get_key(KID)
+        self.advance(101)
+        self.source.get_key(KID)
+
+        self.assertEqual(2, self.server.requests)
+
+    def test_when_no_cache_control_then_default_max_age(self):
+        self.server.max_age = None
+        self.source.get_key(KID)
+
+        self.assertEqual(self.clock.now + keys.JWKS_DEFAULT_MAX_AGE, self.source.expires_at)
+
+    def test_when_keys_near_expiry_then_refreshed_in_background(self):
+        self.source.get_key(KID)
+        self.advance(85)
+
+        # the lookup is answered from the current keys while the refresh runs
+        self.assertEqual(KID, self.source.get_key(KID)['kid'])
+        self.wait_for_refresh()
+
+        self.assertEqual(2, self.server.requests)
+        self.assertEqual(self.clock.now + 100, self.source.expires_at)
+
+    def test_when_kid_unknown_then_refetched_at_most_once_per_interval(self):
+        self.source.get_key(KID)
+        self.server.kids = [KID, 'rotated']
+
+        self.assertIsNone(self.source.get_key('rotated'))
+        self.assertEqual(1, self.server.requests)
+
+        self.advance(keys.JWKS_MIN_REFETCH_INTERVAL)
+        self.assertEqual('rotated', self.source.get_key('rotated')['kid'])
+        self.assertEqual(2, self.server.requests)
+
+        self.assertIsNone(self.source.get_key('unknown'))
+        self.advance(keys.JWKS_MIN_REFETCH_INTERVAL - 1)
+        self.assertIsNone(self.source.get_key('unknown'))
+        self.assertEqual(2, self.server.requests)
+
+    def test_when_server_down_then_stale_keys_served_while_backing_off(self):
+        self.source.get_key(KID)
+        self.server.down = True
+        self.advance(101)
+
+        self.assertEqual(KID, self.source.get_key(KID)['kid'])
+        self.assertEqual(2, self.server.requests)
+
+        # within the first retry interval nothing is fetched
+        self.advance(keys.JWKS_RETRY_INTERVAL - 1)
+        self.assertEqual(KID, self.source.get_key(KID)['kid'])
+        self.assertEqual(2, self.server.requests)
+
+        # the second failure doubles the interval
+        self.advance(1)
+        self.assertEqual(KID, self.source.get_key(KID)['kid'])
+        self.assertEqual(3, self.server.requests)
+        self.advance(keys.JWKS_RETRY_INTERVAL * 2 - 1)
+        self.source.get_key(KID)
+        self.assertEqual(3, self.server.requests)
+
+        self.server.down = False
+        self.advance(1)
+        self.assertEqual(KID, self.source.get_key(KID)['kid'])
+        self.assertEqual(4, self.server.requests)
+        self.assertEqual(0, self.source.failures)
+
+    def test_when_server_down_and_no_keys_then_error_without_refetching(self):
+        self.server.down = True
+
+        with self.assertRaises(Exception):
+            self.source.get_key(KID)
+        with self.assertRaises(LookupError):
+            self.source.get_key(KID)
+        self.assertEqual(1, self.server.requests)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
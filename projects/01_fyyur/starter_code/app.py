@@ -2,17 +2,30 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import csv
 import json
+import base64
+import itertools
+import click
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+import functools
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from werkzeug.datastructures import MultiDict
+from wtforms.validators import DataRequired
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+import sys
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
+from cache import ResponseCache, MemoryBackend
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -23,6 +36,7 @@ moment = Moment(app)
 app.config.from_object('config')
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+cache = ResponseCache(app)
 
 
 # ----------------------------------------------------------------------------#
@@ -30,6 +44,11 @@ migrate = Migrate(app, db)
 # ----------------------------------------------------------------------------#
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
@@ -55,6 +74,8 @@ class Venue(db.Model):
     image_link = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    num_past_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
     shows = db.relationship('Show', backref=db.backref('venue', lazy=True), primaryjoin=id == Show.venue_id)
 
     def __repr__(self):
@@ -77,24 +98,486 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    num_past_shows = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
     shows = db.relationship('Show', backref=db.backref('artist', lazy=True), primaryjoin=id == Show.artist_id)
 
     def __repr__(self):
         return f'<Artist {self.id}, {self.name}>'
 
 
+# ----------------------------------------------------------------------------#
+# Show Counters.
+# ----------------------------------------------------------------------------#
+
+def count_show(venue_id, artist_id, start_time, step=1):
+    # keeps Venue/Artist num_upcoming_shows/num_past_shows in the caller's transaction
+    column = 'num_upcoming_shows' if start_time >= datetime.now() else 'num_past_shows'
+    for model, model_id in ((Venue, venue_id), (Artist, artist_id)):
+        model.query \
+            .filter(model.id == model_id) \
+            .update({column: getattr(model, column) + step}, synchronize_session=False)
+
+
+def refresh_show_counts():
+    # recomputes every counter, moving shows that already started from upcoming to past
+    now = datetime.now()
+    for model, key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        upcoming = db.session.query(db.func.count(Show.id)) \
+            .filter(key == model.id, Show.start_time >= now) \
+            .scalar_subquery()
+        past = db.session.query(db.func.count(Show.id)) \
+            .filter(key == model.id, Show.start_time < now) \
+            .scalar_subquery()
+        model.query.update({'num_upcoming_shows': upcoming, 'num_past_shows': past},
+                           synchronize_session=False)
+    db.session.commit()
+    cache.invalidate('venues')
+
+
+@app.cli.command('roll-shows')
+def roll_shows_command():
+    """Moves started shows from the upcoming to the past counters."""
+    refresh_show_counts()
+
+
+@app.cli.command('check-plans')
+def check_plans_command():
+    """Fails if any read page plans a sequential scan on Show."""
+    statements, failures = [], 0
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    venue = Venue.query.first()
+    artist = Artist.query.first()
+    pages = [('GET', '/venues', None), ('GET', '/artists', None), ('GET', '/shows', None),
+             ('POST', '/venues/search', {'search_term': 'a'}),
+             ('POST', '/artists/search', {'search_term': 'a'})]
+    if venue is not None:
+        pages.append(('GET', '/venues/{}'.format(venue.id), None))
+    if artist is not None:
+        pages.append(('GET', '/artists/{}'.format(artist.id), None))
+
+    # a page served from the cache runs no query and would pass unchecked
+    cache.enabled = False
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        client = app.test_client()
+        for method, path, data in pages:
+            response = client.open(path, method=method, data=data)
+            # the pages share the command's app context and session, so a failed
+            # page would leave the transaction aborted for every page after it
+            db.session.remove()
+            if response.status_code != 200:
+                failures += 1
+                click.echo('{} {} returned {}'.format(method, path, response.status_code), err=True)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+        cache.enabled = True
+
+    if not statements:
+        click.echo('no queries captured, nothing was checked', err=True)
+        sys.exit(1)
+
+    with db.engine.connect() as conn:
+        # small seeded tables always favour a seq scan, so only report the ones no index can avoid
+        conn.exec_driver_sql('SET enable_seqscan = off')
+        for statement, parameters in statements:
+            plan = '\n'.join(row[0] for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters))
+            if 'Seq Scan on "Show"' in plan:
+                failures += 1
+                click.echo('{}\n{}\n'.format(statement, plan))
+
+    click.echo('{} queries checked, {} failures'.format(len(statements), failures))
+    if failures:
+        sys.exit(1)
+
+
+# ----------------------------------------------------------------------------#
+# Cache Invalidation.
+# ----------------------------------------------------------------------------#
+
+def partner_tags(key, entity_id, partner_key, tag):
+    # detail pages of the artists (or venues) sharing a show with the entity
+    partners = db.session.query(partner_key).filter(key == entity_id).distinct()
+    return [tag.format(partner_id) for partner_id, in partners]
+
+
+# ----------------------------------------------------------------------------#
+# Bulk Import.
+# ----------------------------------------------------------------------------#
+
+IMPORT_BATCH_SIZE = 5000
+
+IMPORTS = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm)
+}
+
+
+def read_records(stream, format):
+    # yields (line, record), or (line, error) for lines that can't be parsed
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # multi-valued columns (genres) are ';' separated in csv
+            yield reader.line_num, {key: value.split(';') if key == 'genres' else value
+                                    for key, value in row.items()}
+    else:
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                yield line, e
+                continue
+            yield line, record if isinstance(record, dict) else ValueError('expected a JSON object')
+
+
+def validate_record(form_class, columns, record):
+    formdata = MultiDict()
+    for key, value in record.items():
+        if value is None:
+            continue
+        for item in (value if isinstance(value, list) else [value]):
+            formdata.add(key, item if isinstance(item, str) else str(item))
+
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    # DataRequired accepts a field default (ShowForm.start_time is the import time), so the
+    # required fields must come from the record itself
+    missing = {field.name: ['This field is required.'] for field in form
+               if not field.raw_data and any(isinstance(validator, DataRequired) for validator in field.validators)}
+    if not form.validate() or missing:
+        return None, dict(form.errors, **missing)
+    return {key: value for key, value in form.data.items() if key in columns}, None
+
+
+def record_id(value):
+    # ids come back from the forms as strings, None or '' when the record left them out
+    value = (value or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def insert_rows(model, rows):
+    # one executemany for the batch; if the database rejects it, each row is retried in its own
+    # savepoint so only the offending lines are lost
+    try:
+        db.session.execute(model.__table__.insert(), [row for _, row in rows])
+        db.session.commit()
+        return rows, []
+    except SQLAlchemyError:
+        db.session.rollback()
+
+    inserted, errors = [], []
+    for line, row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(model.__table__.insert(), row)
+            inserted.append((line, row))
+        except SQLAlchemyError as e:
+            errors.append((line, 'rejected by the database: {}'.format(e.__class__.__name__)))
+    db.session.commit()
+    return inserted, errors
+
+
+def import_batch(model, form_class, batch):
+    # batch is [(line, raw record)]; returns the inserted (line, row) pairs and the per-line errors
+    columns = {column.name for column in model.__table__.columns}
+    rows, errors = [], []
+    for line, record in batch:
+        if isinstance(record, Exception):
+            errors.append((line, str(record)))
+            continue
+        row, row_errors = validate_record(form_class, columns, record)
+        if row_errors:
+            errors.append((line, row_errors))
+        else:
+            rows.append((line, row))
+
+    if model is Show:
+        venue_ids = {record_id(row['venue_id']) for _, row in rows} - {None}
+        artist_ids = {record_id(row['artist_id']) for _, row in rows} - {None}
+        venue_ids = {id for id, in Venue.query.with_entities(Venue.id).filter(Venue.id.in_(venue_ids))}
+        artist_ids = {id for id, in Artist.query.with_entities(Artist.id).filter(Artist.id.in_(artist_ids))}
+        valid = []
+        for line, row in rows:
+            venue_id, artist_id = record_id(row['venue_id']), record_id(row['artist_id'])
+            if not (row['venue_id'] or '').strip():
+                errors.append((line, {'venue_id': ['A venue id is required.']}))
+            elif venue_id not in venue_ids:
+                errors.append((line, {'venue_id': ['Unknown venue.']}))
+            elif not (row['artist_id'] or '').strip():
+                errors.append((line, {'artist_id': ['An artist id is required.']}))
+            elif artist_id not in artist_ids:
+                errors.append((line, {'artist_id': ['Unknown artist.']}))
+            else:
+                row['venue_id'], row['artist_id'] = venue_id, artist_id
+                valid.append((line, row))
+        rows = valid
+
+    if not rows:
+        return [], errors
+
+    inserted, rejected = insert_rows(model, rows)
+    return inserted, errors + rejected
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Defaults to the file extension.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+def import_command(kind, source, format, batch_size):
+    """
+    Bulk loads venues, artists or shows from a CSV or NDJSON file.
+
+    The cached pages are invalidated through CACHE_BACKEND, so with the per-process
+    memory backend the running workers keep serving them until CACHE_TTL expires.
+    """
+    model, form_class = IMPORTS[kind]
+    format = format or ('csv' if source.name.endswith('.csv') else 'ndjson')
+    if isinstance(cache.backend, MemoryBackend):
+        click.echo('CACHE_BACKEND is memory: running workers will serve their cached pages for up to '
+                   '{} seconds, use CACHE_BACKEND=redis to invalidate them now'.format(cache.ttl), err=True)
+
+    imported, failed, tags = 0, 0, {kind}
+    # the forms need a request context to be built outside a view
+    with app.test_request_context():
+        lines = read_records(source, format)
+        while True:
+            batch = list(itertools.islice(lines, batch_size))
+            if not batch:
+                break
+            inserted, errors = import_batch(model, form_class, batch)
+            imported += len(inserted)
+            failed += len(errors)
+            if model is Show:
+                # the detail pages list their shows
+                for _, row in inserted:
+                    tags.update(('venue:{}'.format(row['venue_id']), 'artist:{}'.format(row['artist_id'])))
+            for line, error in sorted(errors, key=lambda error: error[0]):
+                click.echo('line {}: {}'.format(line, error), err=True)
+
+    if model is Show:
+        refresh_show_counts()
+    cache.invalidate(*tags)
+    click.echo('{} {} imported, {} rejected'.format(imported, kind, failed))
+
+
+# ----------------------------------------------------------------------------#
+# Search.
+# ----------------------------------------------------------------------------#
+
+GENRES = [genre for genre, _ in VenueForm.genres.kwargs['choices']]
+
+
+def search(model, search_term):
+    # name/city/state are covered by pg_trgm GIN indexes, so '%term%' doesn't scan the table
+    pattern = "%{}%".format(search_term)
+    genres = [genre for genre in GENRES if search_term.lower() in genre.lower()]
+    criteria = [model.name.ilike(pattern), model.city.ilike(pattern), model.state.ilike(pattern)]
+    if genres:
+        # the literal is text[], cast it to the column's varchar[] or postgres has no && for the pair
+        criteria.append(model.genres.op('&&')(db.cast(postgresql.array(genres), model.genres.type)))
+
+    return model.query \
+        .with_entities(model.id.label('id'),
+                       model.name.label('name'),
+                       model.num_upcoming_shows.label('num_upcoming_shows')) \
+        .filter(db.or_(*criteria)) \
+        .order_by(search_rank(model, search_term).desc(), model.name, model.id)
+
+
+def search_rank(model, search_term):
+    # pg_trgm similarity, search() is postgres only (ARRAY genres, '&&')
+    return db.func.similarity(model.name, search_term)
+
+
+# ----------------------------------------------------------------------------#
+# Pagination.
+# ----------------------------------------------------------------------------#
+
+PAGE_SIZE = 30
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor, types):
+    # cursors come from the query string, anything but a list of the key types is a bad request
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        abort(400)
+    if not isinstance(values, list) or len(values) != len(types) or \
+            not all(isinstance(value, key_type) and not isinstance(value, bool)
+                    for value, key_type in zip(values, types)):
+        abort(400)
+    return values
+
+
+def show_cursor(cursor):
+    start_time, show_id = decode_cursor(cursor, (str, int))
+    try:
+        return [dateutil.parser.parse(start_time), show_id]
+    except (ValueError, OverflowError):
+        abort(400)
+
+
+def keyset_paginate(query, keys, key_of, after=None, before=None):
+    # keys must be a unique ordering, e.g. (name, id); seeks with a row comparison instead of OFFSET
+    if before is not None:
+        rows = query \
+            .filter(db.tuple_(*keys) < db.tuple_(*before)) \
+            .order_by(*[key.desc() for key in keys]) \
+            .limit(PAGE_SIZE + 1) \
+            .all()
+        has_prev, has_next = len(rows) > PAGE_SIZE, True
+        rows = rows[:PAGE_SIZE][::-1]
+    else:
+        if after is not None:
+            query = query.filter(db.tuple_(*keys) > db.tuple_(*after))
+        rows = query.order_by(*keys).limit(PAGE_SIZE + 1).all()
+        has_prev, has_next = after is not None, len(rows) > PAGE_SIZE
+        rows = rows[:PAGE_SIZE]
+
+    return {
+        "items": rows,
+        "prev": encode_cursor(key_of(rows[0])) if rows and has_prev else None,
+        "next": encode_cursor(key_of(rows[-1])) if rows and has_next else None
+    }
+
+
+# ----------------------------------------------------------------------------#
+# Detail Pages.
+# ----------------------------------------------------------------------------#
+
+SHOWS_PER_SECTION = 24
+
+VENUE_SHOW_COLUMNS = (Show.id.label('id'),
+                      Show.venue_id.label('venue_id'),
+                      Show.artist_id.label('artist_id'),
+                      Show.start_time.label('start_time'),
+                      Artist.name.label('artist_name'),
+                      Artist.image_link.label('artist_image_link'))
+
+ARTIST_SHOW_COLUMNS = (Show.id.label('id'),
+                       Show.venue_id.label('venue_id'),
+                       Show.artist_id.label('artist_id'),
+                       Show.start_time.label('start_time'),
+                       Venue.name.label('venue_name'),
+                       Venue.image_link.label('venue_image_link'))
+
+
+def as_dict(model):
+    return {column.name: getattr(model, column.name) for column in model.__table__.columns}
+
+
+def load_shows(key, entity_id, columns):
+    # one query for both sections: each side is capped by row_number and counted by a window count
+    now = datetime.now()
+    upcoming = Show.start_time >= now
+    ranked = db.session \
+        .query(Show).join(Artist).join(Venue) \
+        .with_entities(*columns,
+                       upcoming.label('upcoming'),
+                       db.func.row_number().over(partition_by=upcoming,
+                                                 order_by=(Show.start_time, Show.id)).label('position'),
+                       db.func.count(Show.id).over(partition_by=upcoming).label('total')) \
+        .filter(key == entity_id) \
+        .subquery()
+    shows = db.session \
+        .query(ranked) \
+        .filter(db.or_(db.and_(ranked.c.upcoming, ranked.c.position <= SHOWS_PER_SECTION),
+                       db.and_(db.not_(ranked.c.upcoming),
+                               ranked.c.position > ranked.c.total - SHOWS_PER_SECTION))) \
+        .order_by(ranked.c.start_time, ranked.c.id) \
+        .all()
+
+    upcoming_shows = [show for show in shows if show.upcoming]
+    past_shows = [show for show in reversed(shows) if not show.upcoming]
+    upcoming_shows_count = upcoming_shows[0].total if upcoming_shows else 0
+    past_shows_count = past_shows[0].total if past_shows else 0
+
+    return {
+        'upcoming_shows': upcoming_shows,
+        'upcoming_shows_count': upcoming_shows_count,
+        'upcoming_shows_next': show_cursor_of(upcoming_shows, upcoming_shows_count),
+        'past_shows': past_shows,
+        'past_shows_count': past_shows_count,
+        'past_shows_next': show_cursor_of(past_shows, past_shows_count)
+    }
+
+
+def show_cursor_of(shows, total):
+    if len(shows) < total:
+        return encode_cursor([shows[-1].start_time, shows[-1].id])
+    return None
+
+
+def more_shows(key, entity_id, columns, endpoint, kind):
+    # "load more" for a detail page section, rendered as tiles the page appends in place
+    when = request.args.get('when', 'upcoming')
+    after = request.args.get('after')
+    if when not in ('upcoming', 'past') or after is None:
+        abort(400)
+
+    cursor = db.tuple_(*show_cursor(after))
+    query = db.session \
+        .query(Show).join(Artist).join(Venue) \
+        .with_entities(*columns) \
+        .filter(key == entity_id)
+    if when == 'upcoming':
+        query = query \
+            .filter(Show.start_time >= datetime.now(), db.tuple_(Show.start_time, Show.id) > cursor) \
+            .order_by(Show.start_time, Show.id)
+    else:
+        query = query \
+            .filter(Show.start_time < datetime.now(), db.tuple_(Show.start_time, Show.id) < cursor) \
+            .order_by(Show.start_time.desc(), Show.id.desc())
+    shows = query.limit(SHOWS_PER_SECTION + 1).all()
+
+    next_url = None
+    if len(shows) > SHOWS_PER_SECTION:
+        shows = shows[:SHOWS_PER_SECTION]
+        next_url = url_for(endpoint, when=when, after=encode_cursor([shows[-1].start_time, shows[-1].id]),
+                           **{key.name: entity_id})
+
+    return render_template('includes/show_tiles.html', shows=shows, kind=kind, next_url=next_url)
+
+
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+    # babel re-parses the pattern string on every call otherwise
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+
+@functools.lru_cache(maxsize=4096)
+def format_native_datetime(date, format, locale):
+    pattern, locale = datetime_pattern(format, locale)
+    return pattern.apply(date, locale)
+
+
 def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    # return babel.dates.format_datetime(date, format)
-    return babel.dates.format_datetime(date, format, locale='en')
+    # Show.start_time is already a datetime, only strings need parsing
+    date = value if isinstance(value, datetime) else dateutil.parser.parse(value)
+    return format_native_datetime(date, format, 'en')
 
 
 app.jinja_env.filters['datetime'] = format_datetime
@@ -113,79 +596,66 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@cache.cached('venues')
 def venues():
-    shows = lambda v: Venue.query \
+    venues = Venue.query \
         .with_entities(Venue.id.label('id'),
                        Venue.name.label('name'),
-                       Venue,
-                       Show.query
-                       .with_entities(db.func.count(1))
-                       .filter(Show.venue_id == Venue.id, Show.start_time >= datetime.now())
-                       .label('num_upcoming_shows')) \
-        .filter(Venue.state == v.state, Venue.city == v.city)
+                       Venue.city.label('city'),
+                       Venue.state.label('state'),
+                       Venue.num_upcoming_shows.label('num_upcoming_shows')) \
+        .order_by(Venue.state, Venue.city, Venue.name, Venue.id) \
+        .all()
+
+    return render_template('pages/venues.html', areas=group_by_area(venues))
 
-    data = [
-        {
-            "state": venue.state,
-            "city": venue.city,
-            "venues": shows(venue)
-        }
-        for venue in Venue.query.distinct(Venue.state, Venue.city)]
 
-    return render_template('pages/venues.html', areas=data)
+def group_by_area(venues):
+    # venues must come ordered by (state, city) so each area is contiguous
+    areas = []
+    for venue in venues:
+        if not areas or (areas[-1]['state'], areas[-1]['city']) != (venue.state, venue.city):
+            areas.append({
+                "state": venue.state,
+                "city": venue.city,
+                "venues": []
+            })
+        areas[-1]['venues'].append(venue)
+
+    return areas
 
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
     search_term = request.form.get('search_term', '')
 
-    data = Venue.query \
-        .with_entities(Venue.id.label('id'),
-                       Venue.name.label('name'),
-                       Show.query
-                       .with_entities(db.func.count(1))
-                       .filter(Show.venue_id == Venue.id, Show.start_time >= datetime.now())
-                       .label('num_upcoming_shows')) \
-        .filter(Venue.name.ilike("%{}%".format(search_term)))
+    data = search(Venue, search_term).all()
 
     response = {
-        "count": data.count(),
+        "count": len(data),
         "data": data
     }
     return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 
 @app.route('/venues/<int:venue_id>')
+@cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
-    data = Venue.query.get(venue_id).__dict__
-
-    past_shows = db.session \
-        .query(Show).join(Artist).join(Venue) \
-        .with_entities(Show.venue_id.label('venue_id'),
-                       Show.artist_id.label('artist_id'),
-                       Show.start_time.label('start_time'),
-                       Artist.name.label('artist_name'),
-                       Artist.image_link.label('artist_image_link')) \
-        .filter(Show.venue_id == venue_id, Show.start_time < datetime.now())
-    past_shows_count = past_shows.count()
-    upcoming_shows = db.session \
-        .query(Show).join(Artist).join(Venue) \
-        .with_entities(Show.venue_id.label('venue_id'),
-                       Show.artist_id.label('artist_id'),
-                       Show.start_time.label('start_time'),
-                       Artist.name.label('artist_name'),
-                       Artist.image_link.label('artist_image_link')) \
-        .filter(Show.venue_id == venue_id, Show.start_time >= datetime.now())
-    upcoming_shows_count = upcoming_shows.count()
+    venue = Venue.query.get(venue_id)
+    if venue is None:
+        abort(404)
 
-    data['past_shows'] = past_shows
-    data['past_shows_count'] = past_shows_count
-    data['upcoming_shows'] = upcoming_shows
-    data['upcoming_shows_count'] = upcoming_shows_count
+    data = as_dict(venue)
+    data.update(load_shows(Show.venue_id, venue_id, VENUE_SHOW_COLUMNS))
 
     return render_template('pages/show_venue.html', venue=data)
 
 
+@app.route('/venues/<int:venue_id>/shows')
+def show_venue_shows(venue_id):
+    return more_shows(Show.venue_id, venue_id, VENUE_SHOW_COLUMNS, 'show_venue_shows', 'artist')
+
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
@@ -211,6 +681,7 @@ def create_venue_submission():
                       seeking_description=request.form.get('seeking_description'))
         db.session.add(venue)
         db.session.commit()
+        cache.invalidate('venues')
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
     except:
         db.session.rollback()
@@ -225,39 +696,58 @@ def create_venue_submission():
 def delete_venue(venue_id):
     try:
         venue = Venue.query.get(venue_id)
+        tags = ['venues', 'shows', 'venue:{}'.format(venue.id)]
+        now = datetime.now()
+        artist_counts = db.session \
+            .query(Show.artist_id,
+                   db.func.count(Show.id).filter(Show.start_time >= now),
+                   db.func.count(Show.id).filter(Show.start_time < now)) \
+            .filter(Show.venue_id == venue.id) \
+            .group_by(Show.artist_id)
+        for artist_id, upcoming, past in artist_counts:
+            tags.append('artist:{}'.format(artist_id))
+            Artist.query \
+                .filter(Artist.id == artist_id) \
+                .update({'num_upcoming_shows': Artist.num_upcoming_shows - upcoming,
+                         'num_past_shows': Artist.num_past_shows - past},
+                        synchronize_session=False)
+        Show.query.filter(Show.venue_id == venue.id).delete(synchronize_session=False)
         db.session.delete(venue)
         db.session.commit()
+        cache.invalidate(*tags)
     except:
         db.session.rollback()
     finally:
         db.session.close()
 
-    return None
+    return Response(status=204)
 
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@cache.cached('artists')
 def artists():
-    data = Artist.query.with_entities(Artist.id, Artist.name).all()
-    return render_template('pages/artists.html', artists=data)
+    after = request.args.get('after')
+    before = request.args.get('before')
+
+    page = keyset_paginate(Artist.query.with_entities(Artist.id, Artist.name),
+                           keys=(Artist.name, Artist.id),
+                           key_of=lambda artist: [artist.name, artist.id],
+                           after=decode_cursor(after, (str, int)) if after else None,
+                           before=decode_cursor(before, (str, int)) if before else None)
+
+    return render_template('pages/artists.html', artists=page['items'], page=page)
 
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
     search_term = request.form.get('search_term', '')
 
-    data = Artist.query \
-        .with_entities(Artist.id.label('id'),
-                       Artist.name.label('name'),
-                       Show.query
-                       .with_entities(db.func.count(1))
-                       .filter(Show.artist_id == Artist.id, Show.start_time >= datetime.now())
-                       .label('num_upcoming_shows')) \
-        .filter(Artist.name.ilike("%{}%".format(search_term)))
+    data = search(Artist, search_term).all()
 
     response = {
-        "count": data.count(),
+        "count": len(data),
         "data": data
     }
 
@@ -266,36 +756,23 @@ def search_artists():
 
 
 @app.route('/artists/<int:artist_id>')
+@cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
-    data = Artist.query.get(artist_id).__dict__
-
-    past_shows = db.session \
-        .query(Show).join(Artist).join(Venue) \
-        .with_entities(Venue.name.label('venue_name'),
-                       Venue.image_link.label('venue_image_link'),
-                       Show.venue_id.label('venue_id'),
-                       Show.artist_id.label('artist_id'),
-                       Show.start_time.label('start_time')) \
-        .filter(Show.artist_id == artist_id, Show.start_time < datetime.now())
-    past_shows_count = past_shows.count()
-    upcoming_shows = db.session \
-        .query(Show).join(Artist).join(Venue) \
-        .with_entities(Venue.name.label('venue_name'),
-                       Venue.image_link.label('venue_image_link'),
-                       Show.venue_id.label('venue_id'),
-                       Show.artist_id.label('artist_id'),
-                       Show.start_time.label('start_time')) \
-        .filter(Show.artist_id == artist_id, Show.start_time >= datetime.now())
-    upcoming_shows_count = upcoming_shows.count()
+    artist = Artist.query.get(artist_id)
+    if artist is None:
+        abort(404)
 
-    data['past_shows'] = past_shows
-    data['past_shows_count'] = past_shows_count
-    data['upcoming_shows'] = upcoming_shows
-    data['upcoming_shows_count'] = upcoming_shows_count
+    data = as_dict(artist)
+    data.update(load_shows(Show.artist_id, artist_id, ARTIST_SHOW_COLUMNS))
 
     return render_template('pages/show_artist.html', artist=data)
 
 
+@app.route('/artists/<int:artist_id>/shows')
+def show_artist_shows(artist_id):
+    return more_shows(Show.artist_id, artist_id, ARTIST_SHOW_COLUMNS, 'show_artist_shows', 'venue')
+
+
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
@@ -329,7 +806,9 @@ def edit_artist_submission(artist_id):
         artist.seeking_venue = request.form.get('seeking_venue') is not None
         artist.seeking_description = request.form.get('seeking_description')
         artist.image_link = request.form.get('image_link')
+        tags = partner_tags(Show.artist_id, artist_id, Show.venue_id, 'venue:{}')
         db.session.commit()
+        cache.invalidate('artists', 'shows', 'artist:{}'.format(artist_id), *tags)
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
     except:
         db.session.rollback()
@@ -372,7 +851,9 @@ def edit_venue_submission(venue_id):
         venue.image_link = request.form.get('image_link')
         venue.seeking_talent = request.form.get('seeking_talent') is not None
         venue.seeking_description = request.form['seeking_description']
+        tags = partner_tags(Show.venue_id, venue_id, Show.artist_id, 'artist:{}')
         db.session.commit()
+        cache.invalidate('venues', 'shows', 'venue:{}'.format(venue_id), *tags)
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
     except:
         db.session.rollback()
@@ -407,6 +888,7 @@ def create_artist_submission():
                         seeking_description=request.form.get('seeking_description'))
         db.session.add(artist)
         db.session.commit()
+        cache.invalidate('artists')
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
     except:
         db.session.rollback()
@@ -421,22 +903,33 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@cache.cached('shows')
 def shows():
-    data = db.session.query(
+    after = request.args.get('after')
+    before = request.args.get('before')
+
+    query = db.session.query(
         Show
     ).join(
         Artist
     ).join(
         Venue
     ).with_entities(
+        Show.id.label('id'),
         Show.venue_id.label('venue_id'),
         Show.artist_id.label('artist_id'),
         Show.start_time.label('start_time'),
         Venue.name.label('venue_name'),
         Artist.name.label('artist_name'),
         Artist.image_link.label('artist_image_link')
-    ).all()
-    return render_template('pages/shows.html', shows=data)
+    )
+    page = keyset_paginate(query,
+                           keys=(Show.start_time, Show.id),
+                           key_of=lambda show: [show.start_time, show.id],
+                           after=show_cursor(after) if after else None,
+                           before=show_cursor(before) if before else None)
+
+    return render_template('pages/shows.html', shows=page['items'], page=page)
 
 
 @app.route('/shows/create')
@@ -451,9 +944,12 @@ def create_show_submission():
     try:
         show = Show(artist_id=request.form.get('artist_id'),
                     venue_id=request.form.get('venue_id'),
-                    start_time=request.form.get('start_time'))
+                    start_time=dateutil.parser.parse(request.form.get('start_time')))
         db.session.add(show)
+        count_show(show.venue_id, show.artist_id, show.start_time)
+        tags = ['venues', 'shows', 'venue:{}'.format(show.venue_id), 'artist:{}'.format(show.artist_id)]
         db.session.commit()
+        cache.invalidate(*tags)
         flash('Show was successfully listed!')
     except:
         db.session.rollback()
@@ -0,0 +1,75 @@
+'''
+bench_datetime.py
+    per-row cost of the datetime template filter on a page of --shows show rows
+    "before" is the filter as it was, formatting the row through |string and dateutil,
+    "after" is format_datetime with its caches cleared first (cold) and then reused (warm)
+    needs no database
+
+    python bench_datetime.py [--shows 10000] [--runs 5]
+'''
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import app, format_datetime, format_native_datetime
+
+ROW_BEFORE = '{% for show in shows %}<h6>{{ show.start_time|string|datetime_before("full") }}</h6>{% endfor %}'
+ROW_AFTER = '{% for show in shows %}<h6>{{ show.start_time|datetime("full") }}</h6>{% endfor %}'
+
+
+def format_datetime_before(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def shows(count, distinct):
+    # shows start on the hour, cycling through `distinct` start times
+    start = datetime(2035, 1, 1, 20)
+    return [{'start_time': start + timedelta(hours=i % distinct)} for i in range(count)]
+
+
+def per_row(template, rows, runs, before_each=None):
+    timings = []
+    for _ in range(runs):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        template.render(shows=rows)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    environment = app.jinja_env.overlay()
+    environment.filters['datetime_before'] = format_datetime_before
+    before = environment.from_string(ROW_BEFORE)
+    after = environment.from_string(ROW_AFTER)
+    assert format_datetime_before(str(datetime(2035, 1, 1, 20)), 'full') == \
+        format_datetime(datetime(2035, 1, 1, 20), 'full')
+
+    print('{:>7} {:>15} {:>13} {:>13} {:>13}'.format(
+        'shows', 'distinct times', 'before µs', 'cold µs', 'warm µs'))
+    for distinct in (args.shows, 100):
+        rows = shows(args.shows, distinct)
+        print('{:>7} {:>15} {:>13.2f} {:>13.2f} {:>13.2f}'.format(
+            args.shows, distinct,
+            per_row(before, rows, args.runs),
+            per_row(after, rows, args.runs, before_each=format_native_datetime.cache_clear),
+            per_row(after, rows, args.runs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+'''
+bench_search.py
+    latency of searching venues, the former name ilike path against the pg_trgm search()
+    grows Venue to every size with generated venues, times both paths for every term and
+    removes the generated rows at the end; run it against a throwaway database
+    the ilike path runs in a transaction that drops the trigram indexes and rolls back,
+    so it scans the table the way the old search did
+
+    python bench_search.py [--database-url postgresql://localhost:5432/fyyur_bench] [--sizes 10000,100000,1000000]
+'''
+import argparse
+import os
+import statistics
+import time
+
+ADJECTIVES = ['The Musical', 'The Dueling', 'Park Square', 'Blue', 'Golden',
+              'Velvet', 'Midnight', 'Electric', 'Rusty', 'Silver']
+NOUNS = ['Hop', 'Pianos', 'Bar', 'Hall', 'Lounge', 'Club', 'Room', 'Stage', 'Cellar', 'Garden']
+CITIES = ['San Francisco', 'New York', 'Austin', 'Chicago', 'Seattle', 'Portland', 'Denver', 'Boston', 'Nashville',
+          'New Orleans', 'Detroit', 'Atlanta', 'Miami', 'Phoenix', 'Memphis', 'Oakland', 'Brooklyn', 'Houston']
+STATES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY',
+          'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND',
+          'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY']
+TERMS = ['Hop', 'Dueling Pianos 4211', 'san fran', 'no such venue']
+TRIGRAM_INDEXES = ['ix_Venue_name_trgm', 'ix_Venue_city_trgm', 'ix_Venue_state_trgm']
+INSERT_CHUNK_SIZE = 10000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='Defaults to the app configuration.')
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--searches', type=int, default=10)
+    return parser.parse_args()
+
+
+def ensure_search_indexes(db):
+    # the indexes of migration b9e3c5d70a12, for databases built with create_all
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in ('name', 'city', 'state'):
+            conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS "ix_Venue_{0}_trgm" ON "Venue" '
+                                 'USING gin ({0} gin_trgm_ops)'.format(column))
+        conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS "ix_Venue_genres" ON "Venue" USING gin (genres)')
+
+
+def grow(db, Venue, genres, size):
+    current = Venue.query.count()
+    for start in range(current, size, INSERT_CHUNK_SIZE):
+        rows = []
+        for i in range(start, min(start + INSERT_CHUNK_SIZE, size)):
+            # a few hundred areas, like the towns of a real listing
+            city, state = '{} {}'.format(CITIES[i % len(CITIES)], i % 23), STATES[i % len(STATES)]
+            rows.append({'name': '{} {} {}'.format(ADJECTIVES[i % 10], NOUNS[i // 10 % 10], i),
+                         'genres': [genres[i % len(genres)], genres[i * 7 % len(genres)]],
+                         'city': city, 'state': state, 'num_upcoming_shows': 0, 'num_past_shows': 0})
+        db.session.execute(Venue.__table__.insert(), rows)
+        db.session.commit()
+    # flushes the GIN pending lists and refreshes the statistics, as autovacuum would
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('VACUUM ANALYZE "Venue"')
+
+
+def ilike_search(Venue, search_term):
+    # search_venues before the trigram search: a count and the matches, unranked
+    selection = Venue.query \
+        .with_entities(Venue.id.label('id'),
+                       Venue.name.label('name'),
+                       Venue.num_upcoming_shows.label('num_upcoming_shows')) \
+        .filter(Venue.name.ilike("%{}%".format(search_term)))
+    return selection.count(), selection.all()
+
+
+def timed(run, searches):
+    timings = []
+    for _ in range(searches):
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    # the app reads its database when imported
+    from app import app, db, search, Venue, GENRES
+
+    with app.app_context():
+        ensure_search_indexes(db)
+        first_id = (db.session.query(db.func.max(Venue.id)).scalar() or 0) + 1
+        try:
+            print('{:>9} {:<20} {:>8} {:>9} {:>8} {:>11}'.format(
+                'venues', 'term', 'matches', 'ilike ms', 'matches', 'trigram ms'))
+            for size in sorted(int(size) for size in args.sizes.split(',')):
+                grow(db, Venue, GENRES, size)
+                for term in TERMS:
+                    trigram_ms, matches = timed(lambda: search(Venue, term).all(), args.searches)
+
+                    for index in TRIGRAM_INDEXES:
+                        db.session.execute(db.text('DROP INDEX "{}"'.format(index)))
+                    try:
+                        ilike_ms, (count, _) = timed(lambda: ilike_search(Venue, term), args.searches)
+                    finally:
+                        db.session.rollback()
+
+                    print('{:>9} {:<20} {:>8} {:>9.2f} {:>8} {:>11.2f}'.format(
+                        size, term, count, ilike_ms, len(matches), trigram_ms))
+        finally:
+            db.session.rollback()
+            Venue.query.filter(Venue.id >= first_id).delete(synchronize_session=False)
+            db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
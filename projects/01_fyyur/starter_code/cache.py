@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, session, Response
+
+
+class MemoryBackend:
+    """In-process LRU store, one per worker. Meant for development and tests."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl if ttl else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def version(self, tag):
+        return self.versions.get(tag, 0)
+
+    def bump(self, tag):
+        # versions live outside the LRU so evicting one can't resurrect stale pages
+        with self.lock:
+            self.versions[tag] = self.versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def encode_page(page):
+    # a header line then the body, never pickle: anyone who can write to the shared redis
+    # could otherwise run code in every worker that reads the entry
+    body, status, mimetype = page
+    return '{} {}\n'.format(status, mimetype or '').encode('ascii') + body
+
+
+def decode_page(value):
+    header, _, body = value.partition(b'\n')
+    try:
+        status, mimetype = header.decode('ascii').split(' ', 1)
+        return body, int(status), mimetype or None
+    except ValueError:
+        # not a page we wrote, e.g. an entry left by an older release
+        return None
+
+
+class RedisBackend:
+    """
+    Shared store for multi-worker deployments.
+
+    Pages are written with a TTL and versions without one, so run redis with
+    maxmemory-policy volatile-lru to get LRU eviction of pages only.
+    """
+
+    def __init__(self, url, prefix='fyyur:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return decode_page(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, encode_page(value), ex=ttl)
+
+    def version(self, tag):
+        return int(self.client.get(self.prefix + 'version:' + tag) or 0)
+
+    def bump(self, tag):
+        self.client.incr(self.prefix + 'version:' + tag)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """
+    Caches rendered GET responses keyed by path, query string and the versions of the page's tags.
+
+    Invalidating a tag bumps its version, so every page built from it misses on the next request
+    and the stale entries simply age out of the backend.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = None
+        # off, every page is rendered from the database, e.g. to capture its queries
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CACHE_TTL', 300)
+        if app.config.get('CACHE_BACKEND', 'memory') == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.bump(tag)
+
+    def cached(self, *tags):
+        # tags may reference the view arguments, e.g. 'venue:{venue_id}'
+        def cached_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                # pages carrying a flash message are one-off renders
+                if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+                    return f(*args, **kwargs)
+
+                versions = ','.join('{}={}'.format(tag, self.backend.version(tag))
+                                    for tag in (t.format(**kwargs) for t in tags))
+                key = 'page:{}|{}'.format(request.full_path, versions)
+
+                hit = self.backend.get(key)
+                if hit is not None:
+                    body, status, mimetype = hit
+                    return Response(body, status=status, mimetype=mimetype)
+
+                response = f(*args, **kwargs)
+                if not isinstance(response, Response):
+                    response = Response(response)
+                if response.status_code == 200:
+                    self.backend.set(key, (response.get_data(), response.status_code, response.mimetype), self.ttl)
+                return response
+
+            return wrapper
+        return cached_decorator
@@ -0,0 +1,39 @@
+"""show counters
+
+Revision ID: 4f1d2a6b8c3e
+Revises: 70adb34a9b00
+Create Date: 2020-06-02 18:41:07.512930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1d2a6b8c3e'
+down_revision = '70adb34a9b00'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('num_upcoming_shows', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('num_past_shows', sa.Integer(), server_default='0', nullable=False))
+        op.create_index(op.f('ix_{}_num_upcoming_shows'.format(table)), table, ['num_upcoming_shows'], unique=False)
+        op.create_index(op.f('ix_{}_num_past_shows'.format(table)), table, ['num_past_shows'], unique=False)
+        op.execute(
+            'UPDATE "{table}" SET '
+            'num_upcoming_shows = (SELECT count(1) FROM "Show" '
+            'WHERE "Show".{key} = "{table}".id AND "Show".start_time >= now()), '
+            'num_past_shows = (SELECT count(1) FROM "Show" '
+            'WHERE "Show".{key} = "{table}".id AND "Show".start_time < now())'.format(table=table, key=key)
+        )
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_index(op.f('ix_{}_num_past_shows'.format(table)), table_name=table)
+        op.drop_index(op.f('ix_{}_num_upcoming_shows'.format(table)), table_name=table)
+        op.drop_column(table, 'num_past_shows')
+        op.drop_column(table, 'num_upcoming_shows')
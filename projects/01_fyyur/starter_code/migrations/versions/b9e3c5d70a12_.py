@@ -0,0 +1,33 @@
+"""search indexes
+
+Revision ID: b9e3c5d70a12
+Revises: 4f1d2a6b8c3e
+Create Date: 2020-06-04 21:06:52.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e3c5d70a12'
+down_revision = '4f1d2a6b8c3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        for column in ('name', 'city', 'state'):
+            op.create_index('ix_{}_{}_trgm'.format(table, column), table, [column], unique=False,
+                            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+        op.create_index('ix_{}_genres'.format(table), table, ['genres'], unique=False,
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_index('ix_{}_genres'.format(table), table_name=table)
+        for column in ('state', 'city', 'name'):
+            op.drop_index('ix_{}_{}_trgm'.format(table, column), table_name=table)
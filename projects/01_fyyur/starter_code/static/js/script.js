@@ -2,3 +2,15 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+document.addEventListener('click', function (e) {
+  var button = e.target.closest('.load-more');
+  if (!button) {
+    return;
+  }
+  fetch(button.dataset['url']).then(function (response) {
+    return response.text();
+  }).then(function (html) {
+    button.parentNode.outerHTML = html;
+  });
+});
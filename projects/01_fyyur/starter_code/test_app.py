@@ -0,0 +1,300 @@
+import json
+import os
+import pickle
+from datetime import datetime, timedelta
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import event
+
+from cache import encode_page, decode_page
+
+# the app reads its database when imported; fyyur needs PostgreSQL (ARRAY columns, pg_trgm)
+TEST_DATABASE_URL = os.environ.get('FYYUR_TEST_DATABASE_URL')
+if TEST_DATABASE_URL:
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+
+from app import app, db, cache, encode_cursor, Venue, Artist, Show  # noqa: E402
+
+VENUE = {'name': 'The Musical Hop', 'genres': ['Jazz'], 'city': 'San Francisco', 'state': 'CA',
+         'address': '1015 Folsom Street', 'website': 'https://www.themusicalhop.com',
+         'facebook_link': 'https://www.facebook.com/TheMusicalHop'}
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, 'set FYYUR_TEST_DATABASE_URL to a throwaway PostgreSQL database')
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case, its tables are dropped and created for every test"""
+
+    def setUp(self):
+        self.client = app.test_client
+        self.statements = []
+        # pages served from the cache run no query
+        cache.enabled = False
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            self.engine = db.engine
+        # search ranks with pg_trgm, the migrations create it
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+        cache.enabled = True
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def add_venues(self, areas, per_area=3):
+        with app.app_context():
+            db.session.add_all(Venue(name='{} venue {}'.format(city, i), genres=['Jazz'], city=city, state=state)
+                               for city, state in areas for i in range(per_area))
+            db.session.commit()
+            db.session.remove()
+        self.statements.clear()
+
+    def add_venue_and_artist(self):
+        with app.app_context():
+            venue = Venue(name='The Musical Hop', genres=['Jazz'], city='San Francisco', state='CA')
+            artist = Artist(name='Guns N Petals', genres=['Rock n Roll'], city='San Francisco', state='CA')
+            db.session.add_all([venue, artist])
+            db.session.commit()
+            ids = venue.id, artist.id
+            db.session.remove()
+        return ids
+
+    def run_import(self, kind, records):
+        path = os.path.join(tempfile.mkdtemp(), kind + '.ndjson')
+        with open(path, 'w') as source:
+            source.writelines(json.dumps(record) + '\n' for record in records)
+        return app.test_cli_runner().invoke(args=['import', kind, path])
+
+    def test_when_venues_span_more_areas_then_same_query_count(self):
+        self.add_venues([('San Francisco', 'CA')])
+        res = self.client().get('/venues')
+        one_area = len(self.statements)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(1, one_area, self.statements)
+
+        self.add_venues([('City {}'.format(i), 'NY') for i in range(20)])
+        res = self.client().get('/venues')
+
+        self.assertEqual(200, res.status_code)
+        self.assertIn(b'City 19', res.data)
+        self.assertEqual(one_area, len(self.statements), self.statements)
+
+    def test_when_search_term_is_part_of_a_genre_then_venues_of_that_genre_found(self):
+        with app.app_context():
+            db.session.add_all([
+                Venue(name='The Musical Hop', genres=['Jazz', 'Reggae'], city='San Francisco', state='CA'),
+                Venue(name='The Dueling Pianos Bar', genres=['Classical'], city='New York', state='NY'),
+                Venue(name='Park Square Live Music & Coffee', genres=['Rock n Roll', 'Folk'],
+                      city='San Francisco', state='CA')
+            ])
+            db.session.commit()
+            db.session.remove()
+
+        for term in ('a', 'Hop', 'Jazz', 'Musical', 'rock'):
+            res = self.client().post('/venues/search', data={'search_term': term})
+
+            self.assertEqual(200, res.status_code, term)
+
+        res = self.client().post('/venues/search', data={'search_term': 'rock'})
+
+        self.assertIn(b'Number of search results for "rock": 1', res.data)
+        self.assertIn(b'Park Square', res.data)
+
+    def test_when_search_term_is_part_of_a_genre_then_artists_of_that_genre_found(self):
+        self.add_venue_and_artist()
+        res = self.client().post('/artists/search', data={'search_term': 'roll'})
+
+        self.assertEqual(200, res.status_code)
+        self.assertIn(b'Number of search results for "roll": 1', res.data)
+        self.assertIn(b'Guns N Petals', res.data)
+
+    def test_when_show_import_misses_ids_then_those_lines_rejected(self):
+        venue_id, artist_id = self.add_venue_and_artist()
+        start_time = '2035-05-21 21:30:00'
+        result = self.run_import('shows', [
+            {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time},
+            {'artist_id': artist_id, 'start_time': start_time},
+            {'venue_id': '', 'artist_id': artist_id, 'start_time': start_time},
+            {'venue_id': venue_id, 'artist_id': None, 'start_time': start_time},
+            {'venue_id': venue_id, 'artist_id': 999, 'start_time': start_time},
+            {'venue_id': venue_id, 'artist_id': artist_id}
+        ])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn('1 shows imported, 5 rejected', result.output)
+        self.assertIn("line 2: {'venue_id': ['A venue id is required.']}", result.output)
+        self.assertIn("line 3: {'venue_id': ['A venue id is required.']}", result.output)
+        self.assertIn("line 4: {'artist_id': ['An artist id is required.']}", result.output)
+        self.assertIn("line 5: {'artist_id': ['Unknown artist.']}", result.output)
+        self.assertIn("line 6: {'start_time': ['This field is required.']}", result.output)
+        with app.app_context():
+            self.assertEqual(1, Show.query.count())
+
+    def test_when_database_rejects_a_row_then_only_that_line_lost(self):
+        result = self.run_import('venues', [
+            VENUE,
+            dict(VENUE, name='Park Square Live Music & Coffee', city='x' * 121),
+            dict(VENUE, name='The Dueling Pianos Bar')
+        ])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn('2 venues imported, 1 rejected', result.output)
+        self.assertIn('line 2: rejected by the database', result.output)
+        with app.app_context():
+            self.assertEqual(['The Dueling Pianos Bar', 'The Musical Hop'],
+                             [name for name, in Venue.query.with_entities(Venue.name).order_by(Venue.name)])
+
+    def test_when_shows_imported_then_detail_pages_refreshed(self):
+        cache.enabled = True
+        venue_id, artist_id = self.add_venue_and_artist()
+        self.assertNotIn(b'Guns N Petals', self.client().get('/venues/{}'.format(venue_id)).data)
+        self.assertNotIn(b'The Musical Hop', self.client().get('/artists/{}'.format(artist_id)).data)
+
+        result = self.run_import('shows', [
+            {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2035-05-21 21:30:00'}
+        ])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn(b'Guns N Petals', self.client().get('/venues/{}'.format(venue_id)).data)
+        self.assertIn(b'The Musical Hop', self.client().get('/artists/{}'.format(artist_id)).data)
+        with app.app_context():
+            self.assertEqual(1, Show.query.count())
+
+    def test_when_show_created_then_detail_pages_refreshed(self):
+        cache.enabled = True
+        venue_id, artist_id = self.add_venue_and_artist()
+        self.assertNotIn(b'Guns N Petals', self.client().get('/venues/{}'.format(venue_id)).data)
+        self.assertNotIn(b'The Musical Hop', self.client().get('/artists/{}'.format(artist_id)).data)
+
+        self.create_show(venue_id, artist_id, datetime(2035, 5, 21, 21, 30))
+
+        self.assertIn(b'Guns N Petals', self.client().get('/venues/{}'.format(venue_id)).data)
+        self.assertIn(b'The Musical Hop', self.client().get('/artists/{}'.format(artist_id)).data)
+
+    def test_when_pages_cached_then_check_plans_still_explains_their_queries(self):
+        cache.enabled = True
+        venue_id, artist_id = self.add_venue_and_artist()
+        for path in ('/venues', '/artists', '/shows', '/venues/{}'.format(venue_id), '/artists/{}'.format(artist_id)):
+            self.client().get(path)
+
+        result = app.test_cli_runner().invoke(args=['check-plans'])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertRegex(result.output, r'[1-9]\d* queries checked, 0 failures')
+        self.assertTrue(cache.enabled)
+
+    def test_when_one_page_fails_then_check_plans_still_renders_the_others(self):
+        self.add_venue_and_artist()
+        # only the two search pages rank, and the query fails on the database
+        with mock.patch('app.search_rank', lambda model, search_term: db.func.no_such_function(model.name)):
+            result = app.test_cli_runner().invoke(args=['check-plans'])
+
+        self.assertEqual(1, result.exit_code, result.output)
+        self.assertIn('POST /venues/search returned 500', result.output)
+        self.assertIn('POST /artists/search returned 500', result.output)
+        self.assertEqual(2, result.output.count(' returned '), result.output)
+
+    def counters(self, model, entity_id):
+        with app.app_context():
+            entity = model.query.get(entity_id)
+            counts = entity.num_upcoming_shows, entity.num_past_shows
+            db.session.remove()
+        return counts
+
+    def create_show(self, venue_id, artist_id, start_time):
+        return self.client().post('/shows/create', data={
+            'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')})
+
+    def test_when_shows_created_then_counters_follow(self):
+        venue_id, artist_id = self.add_venue_and_artist()
+        self.create_show(venue_id, artist_id, datetime.now() + timedelta(days=30))
+        self.create_show(venue_id, artist_id, datetime.now() + timedelta(days=60))
+        self.create_show(venue_id, artist_id, datetime.now() - timedelta(days=30))
+
+        self.assertEqual((2, 1), self.counters(Venue, venue_id))
+        self.assertEqual((2, 1), self.counters(Artist, artist_id))
+
+    def test_when_venue_deleted_then_its_artists_counters_drop_its_shows(self):
+        venue_id, artist_id = self.add_venue_and_artist()
+        with app.app_context():
+            other = Venue(name='The Dueling Pianos Bar', genres=['Classical'], city='New York', state='NY')
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+            db.session.remove()
+        self.create_show(venue_id, artist_id, datetime.now() + timedelta(days=30))
+        self.create_show(venue_id, artist_id, datetime.now() - timedelta(days=30))
+        self.create_show(other_id, artist_id, datetime.now() + timedelta(days=60))
+
+        res = self.client().delete('/venues/{}'.format(venue_id))
+
+        self.assertEqual(204, res.status_code)
+        self.assertEqual((1, 0), self.counters(Artist, artist_id))
+        self.assertEqual((1, 0), self.counters(Venue, other_id))
+        with app.app_context():
+            self.assertIsNone(Venue.query.get(venue_id))
+            self.assertEqual(1, Show.query.count())
+
+    def test_when_shows_rolled_then_started_shows_count_as_past(self):
+        venue_id, artist_id = self.add_venue_and_artist()
+        self.create_show(venue_id, artist_id, datetime.now() + timedelta(days=30))
+        self.create_show(venue_id, artist_id, datetime.now() + timedelta(days=60))
+        # as if the first show's start time had come
+        with app.app_context():
+            Show.query.filter(Show.start_time < datetime.now() + timedelta(days=45)) \
+                .update({'start_time': datetime.now() - timedelta(hours=1)}, synchronize_session=False)
+            db.session.commit()
+            db.session.remove()
+        self.assertEqual((2, 0), self.counters(Venue, venue_id))
+
+        result = app.test_cli_runner().invoke(args=['roll-shows'])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertEqual((1, 1), self.counters(Venue, venue_id))
+        self.assertEqual((1, 1), self.counters(Artist, artist_id))
+
+
+class CursorTestCase(unittest.TestCase):
+    """This class represents the pagination cursor test case, bad cursors are rejected before any query"""
+
+    def setUp(self):
+        self.client = app.test_client
+
+    def test_when_artist_cursor_is_malformed_then_400(self):
+        for cursor in ('not base64', encode_cursor(5), encode_cursor([1, 2, 3]),
+                       encode_cursor([1, 'name']), encode_cursor(['name', True])):
+            res = self.client().get('/artists', query_string={'after': cursor})
+
+            self.assertEqual(400, res.status_code, cursor)
+
+    def test_when_show_cursor_is_malformed_then_400(self):
+        for cursor in (encode_cursor('2020-01-01'), encode_cursor(['2020-01-01', 1, 2]),
+                       encode_cursor(['not a date', 1]), encode_cursor(['2020-01-01', '1'])):
+            for path in ('/shows', '/venues/1/shows', '/artists/1/shows'):
+                res = self.client().get(path, query_string={'after': cursor})
+
+                self.assertEqual(400, res.status_code, (path, cursor))
+
+
+class PageEncodingTestCase(unittest.TestCase):
+    """This class represents the shared cache page encoding test case, it needs no redis"""
+
+    def test_when_page_encoded_then_decoded_unchanged(self):
+        for page in ((b'<h1>Venues</h1>\n<p>\xe2\x99\xab</p>', 200, 'text/html'), (b'', 200, None)):
+            self.assertEqual(page, decode_page(encode_page(page)))
+
+    def test_when_entry_is_not_an_encoded_page_then_miss(self):
+        for value in (pickle.dumps((b'<h1>Venues</h1>', 200, 'text/html')), b'<h1>Venues</h1>', b'OK text/html\n'):
+            self.assertIsNone(decode_page(value), value)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+'''
+bench_quiz.py
+    latency of picking the next quiz question as the question bank grows
+    grows the bank of the database to every size with generated questions, times
+    random_question() over quizzes of --quiz-length turns and removes the generated rows at the end
+
+    python bench_quiz.py [--database-url postgres://localhost:5432/trivia] [--sizes 1000,10000,100000]
+'''
+import argparse
+import statistics
+import time
+
+from flask import Flask
+
+from flaskr import random_question
+from models import setup_db, database_path, db, clear_question_caches, Question
+
+
+def grow(size):
+    current = Question.count()
+    rows = [{'question': 'Generated question {}'.format(i), 'answer': str(i),
+             'difficulty': 1 + i % 5, 'category': str(1 + i % 6)} for i in range(current, size)]
+    for start in range(0, len(rows), 10000):
+        db.session.execute(Question.__table__.insert(), rows[start:start + 10000])
+        db.session.commit()
+    clear_question_caches()
+
+
+def quiz(category_id, length):
+    # one quiz: the first pick loads the id list, the next ones are served from it
+    previous, timings = [], []
+    for _ in range(length):
+        start = time.perf_counter()
+        question = random_question(category_id, previous)
+        timings.append(time.perf_counter() - start)
+        if question is None:
+            break
+        previous.append(question.id)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=database_path)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--quizzes', type=int, default=200)
+    parser.add_argument('--quiz-length', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    setup_db(app, args.database_url)
+    with app.app_context():
+        first_id = (db.session.query(db.func.max(Question.id)).scalar() or 0) + 1
+        try:
+            print('{:>9} {:>14} {:>14} {:>14}'.format('questions', 'first pick ms', 'next picks ms', 'p99 ms'))
+            for size in sorted(int(size) for size in args.sizes.split(',')):
+                grow(size)
+                first, rest = [], []
+                for i in range(args.quizzes):
+                    # alternate between the whole bank and a category
+                    timings = quiz(None if i % 2 else 1 + i % 6, args.quiz_length)
+                    first.append(timings[0])
+                    rest.extend(timings[1:])
+                    # every quiz starts after a write, the worst case for the cached ids
+                    clear_question_caches()
+                rest.sort()
+                print('{:>9} {:>14.3f} {:>14.3f} {:>14.3f}'.format(
+                    Question.count(), statistics.mean(first) * 1000, statistics.mean(rest) * 1000,
+                    rest[int(len(rest) * 0.99)] * 1000))
+        finally:
+            Question.query.filter(Question.id >= first_id).delete(synchronize_session=False)
+            db.session.commit()
+            clear_question_caches()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+bench_search.py
+    latency of searching questions over trivia.psql scaled --scale times
+    copies the questions of trivia.psql into the database --scale times, times search()
+    for every term and removes the copies at the end
+    on postgres the pg_trgm indexes serve the search, other engines use QuestionIndex
+
+    python bench_search.py [--database-url postgres://localhost:5432/trivia] [--scale 1000]
+'''
+import argparse
+import os
+import statistics
+import time
+
+from flask import Flask
+
+from flaskr.search import setup_search, search
+from models import setup_db, database_path, db, clear_question_caches, Question
+
+TRIVIA_PSQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trivia.psql')
+TERMS = ['title', 'Cassius', 'the', 'Apollo 13', 'no such question']
+
+
+def trivia_questions():
+    # the rows of the COPY public.questions block, without their ids
+    rows, copying = [], False
+    with open(TRIVIA_PSQL) as dump:
+        for line in dump:
+            if line.startswith('COPY public.questions '):
+                copying = True
+            elif copying and line.startswith('\\.'):
+                break
+            elif copying:
+                _, question, answer, difficulty, category = line.rstrip('\n').split('\t')
+                rows.append({'question': question, 'answer': answer,
+                             'difficulty': int(difficulty), 'category': category})
+    return rows
+
+
+def grow(questions, scale):
+    for _ in range(scale):
+        db.session.execute(Question.__table__.insert(), questions)
+    db.session.commit()
+    clear_question_caches()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=database_path)
+    parser.add_argument('--scale', type=int, default=1000)
+    parser.add_argument('--searches', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    setup_db(app, args.database_url)
+    with app.app_context():
+        setup_search()
+        first_id = (db.session.query(db.func.max(Question.id)).scalar() or 0) + 1
+        try:
+            grow(trivia_questions(), args.scale)
+            print('{} questions, {} search'.format(
+                Question.count(), 'pg_trgm' if db.engine.dialect.name == 'postgresql' else 'QuestionIndex'))
+            print('{:<18} {:>8} {:>10} {:>10} {:>10}'.format('term', 'matches', 'cold ms', 'warm ms', 'p99 ms'))
+            for term in TERMS:
+                # cold: the first search after a write, which rebuilds QuestionIndex
+                clear_question_caches()
+                start = time.perf_counter()
+                _, total = search(term, answers=True)
+                cold = time.perf_counter() - start
+
+                warm = []
+                for _ in range(args.searches):
+                    start = time.perf_counter()
+                    search(term, answers=True)
+                    warm.append(time.perf_counter() - start)
+                warm.sort()
+                print('{:<18} {:>8} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                    term, total, cold * 1000, statistics.mean(warm) * 1000,
+                    warm[int(len(warm) * 0.99)] * 1000))
+        finally:
+            Question.query.filter(Question.id >= first_id).delete(synchronize_session=False)
+            db.session.commit()
+            clear_question_caches()
+
+
+if __name__ == '__main__':
+    main()
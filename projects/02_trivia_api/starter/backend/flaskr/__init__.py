@@ -1,29 +1,109 @@
 import os
-from flask import Flask, request, abort, jsonify
+from flask import Flask, request, abort, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy.exc import SQLAlchemyError
+import json
 import random
 
-from models import setup_db, Question, Category
+from models import setup_db, db, clear_question_caches, Question, Category
+from .quiz_sessions import MemoryQuizStore
+from .search import setup_search, search
 
 QUESTIONS_PER_PAGE = 10
+QUIZ_SAMPLE_ATTEMPTS = 8
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
 
 
 def paginate(request, selection):
     page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
-
-    questions = [question.format() for question in selection]
-    current_questions = questions[start:end]
-
-    return current_questions
+    if page < 1:
+        return []
+
+    questions = selection \
+        .order_by(Question.id) \
+        .limit(QUESTIONS_PER_PAGE) \
+        .offset((page - 1) * QUESTIONS_PER_PAGE) \
+        .all()
+
+    return [question.format() for question in questions]
+
+
+def random_question(category_id, previous_questions):
+    # samples the cached id list, only falling back to a scan once most ids were already seen
+    ids = Question.ids(category_id)
+    seen = set(previous_questions)
+
+    for _ in range(QUIZ_SAMPLE_ATTEMPTS if ids else 0):
+        question_id = random.choice(ids)
+        if question_id not in seen:
+            return Question.query.get(question_id)
+
+    remaining = [question_id for question_id in ids if question_id not in seen]
+    return Question.query.get(random.choice(remaining)) if remaining else None
+
+
+def parse_question(line, categories):
+    # returns the row to insert, or the reason the line is rejected
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, 'invalid json'
+    if not isinstance(record, dict):
+        return None, 'expected a question object'
+
+    question = record.get('question', None)
+    answer = record.get('answer', None)
+    difficulty = record.get('difficulty', None)
+    category = record.get('category', None)
+    if not question or not answer or difficulty is None or category is None:
+        return None, 'question, answer, difficulty and category are required'
+    if not isinstance(question, str) or not isinstance(answer, str):
+        return None, 'question and answer must be strings'
+    # bool is an int too
+    if not isinstance(difficulty, int) or isinstance(difficulty, bool):
+        return None, 'difficulty must be an integer'
+    if isinstance(category, bool) or not isinstance(category, (int, str)) or str(category) not in categories:
+        return None, 'unknown category'
+
+    return {
+        'question': question,
+        'answer': answer,
+        'difficulty': difficulty,
+        'category': str(category)
+    }, None
+
+
+def insert_questions(rows):
+    # inserts the (line number, row) pairs in one transaction; if the database rejects it,
+    # retries them one by one so only the offending lines are lost, and returns their errors
+    try:
+        db.session.execute(Question.__table__.insert(), [row for _, row in rows])
+        db.session.commit()
+        return []
+    except SQLAlchemyError:
+        db.session.rollback()
+
+    errors = []
+    for number, row in rows:
+        try:
+            db.session.execute(Question.__table__.insert(), row)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            errors.append({'line': number, 'error': 'rejected by the database'})
+    return errors
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    if test_config is not None:
+        app.config.update(test_config)
     setup_db(app)
+    setup_search()
+    quiz_store = app.config.setdefault('QUIZ_STORE', MemoryQuizStore())
     CORS(app)
 
     # CORS Headers
@@ -35,30 +115,31 @@ def create_app(test_config=None):
 
     @app.route('/categories')
     def get_categories():
-        categories = {category.id: category.type
-                      for category in Category.query.all()}
+        etag = Category.etag()
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
 
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'categories': categories
+            'categories': Category.map()
         })
+        response.set_etag(etag)
+        return response
 
     @app.route('/questions')
     def get_questions():
-        selection = Question.query.all()
-        current_questions = paginate(request, selection)
+        current_questions = paginate(request, Question.query)
 
         if len(current_questions) == 0:
             abort(404)
 
-        categories = {category.id: category.type
-                      for category in Category.query.all()}
-
         return jsonify({
             'success': True,
             'questions': current_questions,
-            'totalQuestions': len(selection),
-            'categories': categories,
+            'totalQuestions': Question.count(),
+            'categories': Category.map(),
             'currentCategory': ''
         })
 
@@ -93,7 +174,7 @@ def create_app(test_config=None):
         new_category = body.get('category', None)
 
         if search_term is not None:
-            return search_questions(request, search_term)
+            return search_questions(request, body, search_term)
 
         elif new_question is not None \
                 and new_answer is not None \
@@ -106,8 +187,7 @@ def create_app(test_config=None):
             abort(400)
 
     def add_questions(new_question, new_answer, new_difficulty, new_category):
-        category = Category.query.get(new_category)
-        if category is None:
+        if Category.get(new_category) is None:
             abort(400)
 
         try:
@@ -124,22 +204,82 @@ def create_app(test_config=None):
         except Exception:
             abort(422)
 
-    def search_questions(request, search_term):
-        selection = Question.query \
-            .filter(Question.question.ilike('%{}%'.format(search_term))) \
-            .all()
-        questions = paginate(request, selection)
+    @app.route('/questions/import', methods=['POST'])
+    def import_questions():
+        categories = {str(category_id) for category_id in Category.map()}
+        imported, errors, rows = 0, [], []
+
+        def flush(rows):
+            rejected = insert_questions(rows)
+            errors.extend(rejected)
+            return len(rows) - len(rejected)
+
+        try:
+            for number, line in enumerate(request.stream, start=1):
+                if not line.strip():
+                    continue
+                row, error = parse_question(line, categories)
+                if error:
+                    errors.append({'line': number, 'error': error})
+                    continue
+
+                rows.append((number, row))
+                if len(rows) == IMPORT_CHUNK_SIZE:
+                    imported, rows = imported + flush(rows), []
+
+            if rows:
+                imported += flush(rows)
+
+        finally:
+            clear_question_caches()
 
         return jsonify({
             'success': True,
-            'questions': questions,
-            'totalQuestions': len(selection),
+            'imported': imported,
+            'errors': sorted(errors, key=lambda error: error['line'])
+        })
+
+    @app.route('/questions/export')
+    def export_questions():
+        def generate():
+            rows = db.session \
+                .query(Question.id, Question.question, Question.answer,
+                       Question.difficulty, Question.category) \
+                .order_by(Question.id) \
+                .execution_options(stream_results=True) \
+                .yield_per(EXPORT_CHUNK_SIZE)
+            for row in rows:
+                yield json.dumps({
+                    'id': row.id,
+                    'question': row.question,
+                    'answer': row.answer,
+                    'difficulty': row.difficulty,
+                    'category': row.category
+                }) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    def search_questions(request, body, search_term):
+        category = body.get('category', None)
+        if category is not None and Category.get(category) is None:
+            abort(400)
+
+        questions, total = search(search_term,
+                                  category=int(category) if category is not None else None,
+                                  answers=bool(body.get('searchAnswers', False)),
+                                  page=request.args.get('page', 1, type=int),
+                                  per_page=QUESTIONS_PER_PAGE)
+
+        return jsonify({
+            'success': True,
+            'questions': [question.format() for question in questions],
+            'totalQuestions': total,
             'currentCategory': ''
         })
 
     @app.route('/categories/<int:category_id>/questions')
     def get_questions_by_category(category_id):
-        category = Category.query.get(category_id)
+        category = Category.get(category_id)
 
         if category is None:
             abort(400)
@@ -150,8 +290,8 @@ def create_app(test_config=None):
         return jsonify({
             'success': True,
             'questions': questions,
-            'totalQuestions': len(questions),
-            'currentCategory': category.format()
+            'totalQuestions': Question.count(category_id),
+            'currentCategory': category
         })
 
     @app.route('/quizzes', methods=['POST'])
@@ -164,15 +304,52 @@ def create_app(test_config=None):
             abort(400)
 
         category_id = int(quiz_category['id'])
+        if Category.get(category_id) is None:
+            category_id = None
+
+        question = random_question(category_id, previous_questions)
+
+        return jsonify({
+            'success': True,
+            'question': question.format() if question else ''
+        })
+
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz_session():
+        body = request.get_json()
+        quiz_category = body.get('quiz_category', None)
+
+        if quiz_category is None:
+            abort(400)
+
+        category_id = int(quiz_category['id'])
+        if Category.get(category_id) is None:
+            category_id = None
+
+        session_id, total = quiz_store.start(Question.ids(category_id))
+
+        return jsonify({
+            'success': True,
+            'session': session_id,
+            'totalQuestions': total
+        })
 
-        query = Question.query.filter(Question.id.notin_(previous_questions))
-        if Category.query.get(category_id):
-            query = query.filter(Question.category == category_id)
-        questions = query.all()
+    @app.route('/quizzes/sessions/<session_id>', methods=['POST'])
+    def next_quiz_question(session_id):
+        try:
+            question = None
+            question_id = quiz_store.pop(session_id)
+            # skip ids deleted since the deck was shuffled
+            while question is None and question_id is not None:
+                question = Question.query.get(question_id)
+                if question is None:
+                    question_id = quiz_store.pop(session_id)
+        except KeyError:
+            abort(404)
 
         return jsonify({
             'success': True,
-            'question': random.choice(questions).format() if questions else ''
+            'question': question.format() if question else ''
         })
 
     # ---
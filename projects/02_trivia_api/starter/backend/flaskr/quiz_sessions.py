@@ -0,0 +1,61 @@
+import random
+import secrets
+import threading
+import time
+
+QUIZ_SESSION_TTL = 60 * 60
+MAX_QUIZ_SESSIONS = 10000
+
+
+'''
+MemoryQuizStore
+    keeps the shuffled deck of question ids of every quiz session in process
+    sessions expire QUIZ_SESSION_TTL seconds after their last turn
+    any object with the same start/pop methods can be passed as QUIZ_STORE
+'''
+
+
+class MemoryQuizStore:
+    def __init__(self, ttl=QUIZ_SESSION_TTL, max_sessions=MAX_QUIZ_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def start(self, question_ids):
+        deck = list(question_ids)
+        random.shuffle(deck)
+        session_id = secrets.token_urlsafe(16)
+
+        with self.lock:
+            self.evict()
+            self.sessions[session_id] = (deck, time.monotonic() + self.ttl)
+
+        return session_id, len(deck)
+
+    '''
+    pop(session_id)
+        returns the next question id of the deck, None once the deck is empty
+        raises KeyError for unknown or expired sessions
+    '''
+    def pop(self, session_id):
+        with self.lock:
+            deck, expires = self.sessions[session_id]
+            if expires < time.monotonic():
+                del self.sessions[session_id]
+                raise KeyError(session_id)
+
+            self.sessions[session_id] = (deck, time.monotonic() + self.ttl)
+            return deck.pop() if deck else None
+
+    def evict(self):
+        now = time.monotonic()
+        for session_id in [key for key, (_, expires) in self.sessions.items() if expires < now]:
+            del self.sessions[session_id]
+
+        # still full: drop the sessions closest to expiring
+        overflow = len(self.sessions) - self.max_sessions + 1
+        if overflow > 0:
+            oldest = sorted(self.sessions, key=lambda key: self.sessions[key][1])[:overflow]
+            for session_id in oldest:
+                del self.sessions[session_id]
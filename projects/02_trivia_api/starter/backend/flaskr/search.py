@@ -0,0 +1,117 @@
+import re
+
+from sqlalchemy import func, or_, text
+
+from models import db, Question, question_index
+
+TOKEN = re.compile(r'\w+')
+
+'''
+setup_search()
+    creates the pg_trgm indexes used to search questions and answers
+    they are idempotent, so running them on every start is cheap
+    other engines search with QuestionIndex instead
+'''
+
+
+def setup_search():
+    if db.engine.dialect.name != 'postgresql':
+        return
+
+    with db.engine.begin() as connection:
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        connection.execute(text('CREATE INDEX IF NOT EXISTS ix_questions_question_trgm '
+                                'ON questions USING gin (question gin_trgm_ops)'))
+        connection.execute(text('CREATE INDEX IF NOT EXISTS ix_questions_answer_trgm '
+                                'ON questions USING gin (answer gin_trgm_ops)'))
+
+
+'''
+QuestionIndex
+    in-memory inverted index of question (and answer) tokens
+    candidates come from the posting lists, then the exact substring is checked
+    rebuilt lazily after any question is inserted or deleted
+'''
+
+
+class QuestionIndex:
+    def __init__(self, questions):
+        self.postings = {}
+        self.documents = {}
+        for question_id, question, answer, category in questions:
+            question, answer = (question or '').lower(), (answer or '').lower()
+            self.documents[question_id] = (question, answer, str(category))
+            for token in set(TOKEN.findall(question)) | set(TOKEN.findall(answer)):
+                self.postings.setdefault(token, set()).add(question_id)
+
+    def candidates(self, search_term):
+        tokens = TOKEN.findall(search_term)
+        if not tokens:
+            return set(self.documents)
+
+        candidates = None
+        for token in tokens:
+            matches = set()
+            for indexed, ids in self.postings.items():
+                if token in indexed:
+                    matches |= ids
+            candidates = matches if candidates is None else candidates & matches
+        return candidates
+
+    def search(self, search_term, category=None, answers=False):
+        search_term = search_term.lower()
+        ranked = []
+        for question_id in self.candidates(search_term):
+            question, answer, question_category = self.documents[question_id]
+            if category is not None and question_category != str(category):
+                continue
+            if search_term in question:
+                ranked.append((-2, -len(search_term) / max(len(question), 1), question_id))
+            elif answers and search_term in answer:
+                ranked.append((-1, -len(search_term) / max(len(answer), 1), question_id))
+
+        return [question_id for _, _, question_id in sorted(ranked)]
+
+
+def get_question_index():
+    if 'index' not in question_index:
+        rows = Question.query.with_entities(Question.id, Question.question, Question.answer, Question.category)
+        question_index['index'] = QuestionIndex(rows)
+    return question_index['index']
+
+
+'''
+search(search_term, category, answers, page, per_page)
+    returns the page of matching questions ranked by relevance and the total number of matches
+'''
+
+
+def search(search_term, category=None, answers=False, page=1, per_page=10):
+    if page < 1:
+        return [], 0
+
+    if db.engine.dialect.name != 'postgresql':
+        ids = get_question_index().search(search_term, category, answers)
+        page_ids = ids[(page - 1) * per_page:page * per_page]
+        questions = {question.id: question
+                     for question in Question.query.filter(Question.id.in_(page_ids))}
+        return [questions[question_id] for question_id in page_ids if question_id in questions], len(ids)
+
+    pattern = '%{}%'.format(search_term)
+    criteria = Question.question.ilike(pattern)
+    rank = func.similarity(Question.question, search_term)
+    if answers:
+        criteria = or_(criteria, Question.answer.ilike(pattern))
+        rank = func.greatest(rank, func.similarity(Question.answer, search_term))
+
+    selection = Question.query.filter(criteria)
+    if category is not None:
+        selection = selection.filter(Question.category == category)
+
+    questions = selection \
+        .order_by(rank.desc(), Question.id) \
+        .limit(per_page) \
+        .offset((page - 1) * per_page) \
+        .all()
+
+    return questions, selection.count()
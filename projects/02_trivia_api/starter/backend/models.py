@@ -1,7 +1,8 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, create_engine, inspect
 from flask_sqlalchemy import SQLAlchemy
 import json
+import hashlib
 
 database_name = "trivia"
 database_path = "postgres://{}/{}".format('localhost:5432', database_name)
@@ -20,6 +21,27 @@ def setup_db(app, database_path=database_path):
     db.app = app
     db.init_app(app)
     db.create_all()
+    # tables restored from trivia.psql predate the model indexes
+    existing = {index['name'] for index in inspect(db.engine).get_indexes(Question.__tablename__)}
+    for index in Question.__table__.indexes:
+        if index.name not in existing:
+            index.create(bind=db.engine)
+
+
+'''
+question_counts, question_ids, question_index
+    cached COUNT(*) and id list of the questions, per category (None for all),
+    and the in-memory search index; cleared whenever a question is inserted or deleted
+'''
+question_counts = {}
+question_ids = {}
+question_index = {}
+
+
+def clear_question_caches():
+    question_counts.clear()
+    question_ids.clear()
+    question_index.clear()
 
 
 '''
@@ -34,7 +56,7 @@ class Question(db.Model):
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(String, index=True)
     difficulty = Column(Integer)
 
     def __init__(self, question, answer, category, difficulty):
@@ -46,6 +68,7 @@ class Question(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        clear_question_caches()
 
     def update(self):
         db.session.commit()
@@ -53,6 +76,25 @@ class Question(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        clear_question_caches()
+
+    @staticmethod
+    def count(category=None):
+        if category not in question_counts:
+            query = Question.query
+            if category is not None:
+                query = query.filter(Question.category == category)
+            question_counts[category] = query.count()
+        return question_counts[category]
+
+    @staticmethod
+    def ids(category=None):
+        if category not in question_ids:
+            query = Question.query.with_entities(Question.id)
+            if category is not None:
+                query = query.filter(Question.category == category)
+            question_ids[category] = [question_id for question_id, in query]
+        return question_ids[category]
 
     def format(self):
         return {
@@ -64,6 +106,24 @@ class Question(db.Model):
         }
 
 
+'''
+category_cache
+    {id: type} map of every category and its ETag, stamped with the
+    category_version it was loaded at; writing a category bumps the version
+'''
+category_cache = {'version': None, 'categories': None, 'etag': None}
+category_version = {'value': 0}
+
+
+def load_categories():
+    if category_cache['version'] != category_version['value']:
+        categories = {category.id: category.type
+                      for category in Category.query.order_by(Category.id)}
+        digest = hashlib.sha1(json.dumps(sorted(categories.items())).encode()).hexdigest()
+        category_cache.update(version=category_version['value'], categories=categories, etag=digest)
+    return category_cache
+
+
 '''
 Category
 
@@ -79,6 +139,43 @@ class Category(db.Model):
     def __init__(self, type):
         self.type = type
 
+    def insert(self):
+        db.session.add(self)
+        db.session.commit()
+        category_version['value'] += 1
+
+    def update(self):
+        db.session.commit()
+        category_version['value'] += 1
+
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
+        category_version['value'] += 1
+
+    @staticmethod
+    def map():
+        return load_categories()['categories']
+
+    @staticmethod
+    def etag():
+        return load_categories()['etag']
+
+    @staticmethod
+    def get(category_id):
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None
+
+        category_type = Category.map().get(category_id)
+        if category_type is None:
+            return None
+        return {
+            'id': category_id,
+            'type': category_type
+        }
+
     def format(self):
         return {
             'id': self.id,
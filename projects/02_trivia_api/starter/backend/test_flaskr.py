@@ -47,6 +47,25 @@ class TriviaTestCase(unittest.TestCase):
                           '5': 'Entertainment',
                           '6': 'Sports'}, data['categories'])
 
+    def test_when_get_categories_with_etag_then_304(self):
+        etag = self.client().get('/categories').headers['ETag']
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+
+        self.assertEqual(304, res.status_code)
+        self.assertEqual(etag, res.headers['ETag'])
+
+    def test_when_category_written_then_categories_reloaded(self):
+        etag = self.client().get('/categories').headers['ETag']
+        category = Category(type='Music')
+        category.insert()
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+        data = json.loads(res.data)
+        category.delete()
+
+        self.assertEqual(200, res.status_code)
+        self.assertNotEqual(etag, res.headers['ETag'])
+        self.assertEqual('Music', data['categories'][str(category.id)])
+
     def test_when_get_questions_paginated_200(self):
         res = self.client().get('/questions?page=1')
         data = json.loads(res.data)
@@ -63,6 +82,29 @@ class TriviaTestCase(unittest.TestCase):
                           '6': 'Sports'}, data['categories'])
         self.assertEqual('', data['currentCategory'])
 
+    def test_when_get_questions_second_page_then_200(self):
+        res = self.client().get('/questions?page=2')
+        data = json.loads(res.data)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(True, data['success'])
+        self.assertEqual(9, len(data['questions']))
+        self.assertEqual(19, data['totalQuestions'])
+
+    def test_when_question_inserted_then_total_questions_updated(self):
+        self.client().get('/questions?page=1')
+        new_question = Question(question='How many planets are in the solar system?',
+                                answer='8',
+                                difficulty=1,
+                                category=1)
+        new_question.insert()
+        res = self.client().get('/questions?page=1')
+        data = json.loads(res.data)
+        new_question.delete()
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(20, data['totalQuestions'])
+
     def test_when_get_questions_paginated_404(self):
         res = self.client().get('/questions?page=99')
         data = json.loads(res.data)
@@ -120,6 +162,57 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(False, data['success'])
         self.assertTrue(data['message'])
 
+    def test_when_import_questions_then_valid_lines_inserted(self):
+        lines = [json.dumps({'question': 'Imported question {}'.format(i),
+                             'answer': str(i),
+                             'difficulty': 1,
+                             'category': 1}) for i in range(3)]
+        lines.insert(1, json.dumps({'question': 'No category', 'answer': '0', 'difficulty': 1, 'category': 0}))
+        lines.insert(2, 'not json')
+        res = self.client().post('/questions/import', data='\n'.join(lines),
+                                 content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        imported = Question.query.filter(Question.question.like('Imported question %')).all()
+        total = json.loads(self.client().get('/questions').data)['totalQuestions']
+        for question in imported:
+            question.delete()
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(True, data['success'])
+        self.assertEqual(3, data['imported'])
+        self.assertEqual([2, 3], [error['line'] for error in data['errors']])
+        self.assertEqual(3, len(imported))
+        self.assertEqual(22, total)
+
+    def test_when_import_line_has_wrong_types_then_line_rejected(self):
+        lines = [json.dumps({'question': 'Imported question 0', 'answer': '0', 'difficulty': 1, 'category': 1}),
+                 json.dumps({'question': 'Hard question', 'answer': '1', 'difficulty': 'hard', 'category': 1}),
+                 json.dumps({'question': 'True question', 'answer': '2', 'difficulty': True, 'category': 1}),
+                 json.dumps({'question': ['Listed question'], 'answer': '3', 'difficulty': 1, 'category': 1}),
+                 json.dumps({'question': 'Imported question 1', 'answer': '4', 'difficulty': 2, 'category': '2'})]
+        res = self.client().post('/questions/import', data='\n'.join(lines),
+                                 content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        imported = Question.query.filter(Question.question.like('Imported question %')).all()
+        for question in imported:
+            question.delete()
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(2, data['imported'])
+        self.assertEqual([2, 3, 4], [error['line'] for error in data['errors']])
+        self.assertEqual(2, len(imported))
+
+    def test_when_export_questions_then_ndjson(self):
+        res = self.client().get('/questions/export')
+        questions = [json.loads(line) for line in res.data.decode().splitlines()]
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual('application/x-ndjson', res.mimetype)
+        self.assertEqual(19, len(questions))
+        self.assertEqual(sorted(question['id'] for question in questions), [question['id'] for question in questions])
+
     def test_when_post_questions_search_then_200(self):
         res = self.client().post('/questions', json={'searchTerm': 'Peanut Butter'})
         data = json.loads(res.data)
@@ -130,6 +223,29 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(1, data['totalQuestions'])
         self.assertEqual('', data['currentCategory'])
 
+    def test_when_post_questions_search_answers_then_200(self):
+        res = self.client().post('/questions', json={'searchTerm': 'scarab', 'searchAnswers': True})
+        data = json.loads(res.data)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(True, data['success'])
+        self.assertEqual(1, data['totalQuestions'])
+        self.assertEqual(23, data['questions'][0]['id'])
+
+    def test_when_post_questions_search_in_category_then_200(self):
+        res = self.client().post('/questions', json={'searchTerm': 'soccer', 'category': 6})
+        data = json.loads(res.data)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(2, data['totalQuestions'])
+        self.assertEqual({'6'}, {str(question['category']) for question in data['questions']})
+
+        res = self.client().post('/questions', json={'searchTerm': 'soccer', 'category': 1})
+        data = json.loads(res.data)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(0, data['totalQuestions'])
+
     def test_when_post_questions_search_then_400(self):
         res = self.client().post('/questions', json={'searchTerm': None})
         data = json.loads(res.data)
@@ -148,6 +264,15 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(4, data['totalQuestions'])
         self.assertEqual('Art', data['currentCategory']['type'])
 
+    def test_when_get_questions_by_category_past_last_page_then_total_of_category(self):
+        res = self.client().get('/categories/2/questions?page=2')
+        data = json.loads(res.data)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(True, data['success'])
+        self.assertEqual([], data['questions'])
+        self.assertEqual(4, data['totalQuestions'])
+
     def test_when_get_questions_by_category_then_400(self):
         res = self.client().get('/categories/0/questions')
         data = json.loads(res.data)
@@ -168,6 +293,30 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(True, data['success'])
         self.assertTrue(data['question'])
 
+    def test_when_post_quizzes_with_previous_questions_then_unseen_question(self):
+        res = self.client().post('/quizzes', json={'previous_questions': [20, 21],
+                                                   'quiz_category': {
+                                                       'type': 'Science',
+                                                       'id': 1
+                                                   }})
+        data = json.loads(res.data)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(True, data['success'])
+        self.assertEqual(22, data['question']['id'])
+
+    def test_when_post_quizzes_all_seen_then_no_question(self):
+        res = self.client().post('/quizzes', json={'previous_questions': [20, 21, 22],
+                                                   'quiz_category': {
+                                                       'type': 'Science',
+                                                       'id': 1
+                                                   }})
+        data = json.loads(res.data)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(True, data['success'])
+        self.assertEqual('', data['question'])
+
     def test_when_post_quizzes_then_400(self):
         res = self.client().post('/quizzes', json={'previous_questions': '',
                                                    'quiz_category': None})
@@ -177,6 +326,31 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(False, data['success'])
         self.assertTrue(data['message'])
 
+    def test_when_quiz_session_played_then_every_question_once(self):
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {
+            'type': 'Science',
+            'id': 1
+        }})
+        data = json.loads(res.data)
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(True, data['success'])
+        self.assertEqual(3, data['totalQuestions'])
+
+        session_url = '/quizzes/sessions/' + data['session']
+        questions = [json.loads(self.client().post(session_url).data)['question'] for _ in range(4)]
+
+        self.assertEqual([20, 21, 22], sorted(question['id'] for question in questions[:3]))
+        self.assertEqual('', questions[3])
+
+    def test_when_quiz_session_unknown_then_404(self):
+        res = self.client().post('/quizzes/sessions/unknown')
+        data = json.loads(res.data)
+
+        self.assertEqual(404, res.status_code)
+        self.assertEqual(False, data['success'])
+        self.assertTrue(data['message'])
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
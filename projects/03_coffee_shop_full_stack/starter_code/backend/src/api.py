@@ -1,10 +1,9 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
 from sqlalchemy import exc
-import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db, db_create_all, db_drop_and_create_all, migrate_recipes, setup_db, Drink, get_menu_version
 from .auth.auth import AuthError, requires_auth
 
 app = Flask(__name__)
@@ -23,12 +22,34 @@ def after_request(response):
 
 
 '''
-@TODO uncomment the following line to initialize the datbase
-!! NOTE THIS WILL DROP ALL RECORDS AND START YOUR DB FROM SCRATCH
-!! NOTE THIS MUST BE UNCOMMENTED ON FIRST RUN
+flask create-db
+    creates the missing tables, run it once before the first start
+flask reset-db
+    !! NOTE THIS WILL DROP ALL RECORDS AND START YOUR DB FROM SCRATCH
 '''
 
-db_drop_and_create_all()
+
+@app.cli.command('create-db')
+def create_db_command():
+    db_create_all()
+    print('database ready')
+
+
+@app.cli.command('reset-db')
+def reset_db_command():
+    db_drop_and_create_all()
+    print('database reset')
+
+
+'''
+flask migrate-recipes
+    converts the json recipes of a database created before ingredients were stored in their own table
+'''
+
+
+@app.cli.command('migrate-recipes')
+def migrate_recipes_command():
+    print('converted {} drinks'.format(migrate_recipes()))
 
 
 # ROUTES
@@ -36,21 +57,48 @@ db_drop_and_create_all()
 
 @app.route('/drinks', methods=['GET'])
 def get_drinks():
-    drinks = [drink.short() for drink in Drink.query.all()]
-    return jsonify({
-        "success": True,
-        "drinks": drinks
-    })
+    return menu_response('short')
 
 
 @app.route('/drinks-detail', methods=['GET'])
 @requires_auth('get:drinks-detail')
 def get_drinks_detail():
-    drinks = [drink.long() for drink in Drink.query.all()]
-    return jsonify({
-        "success": True,
-        "drinks": drinks
-    })
+    response = menu_response('long')
+    response.cache_control.private = True
+    return response
+
+
+'''
+menu_response(form)
+    the menu in 'short' or 'long' form, validated by the menu version shared by every worker
+    a client already holding the current version gets a 304 after a single primary key lookup,
+    before the menu is queried
+    the version is read first, so a write racing the query only costs the client a refetch
+'''
+
+
+def menu_response(form):
+    version = get_menu_version()
+    etag = version.etag()
+    modified = version.last_modified()
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since:
+        not_modified = request.if_modified_since.replace(tzinfo=None) >= modified
+    else:
+        not_modified = False
+
+    if not_modified:
+        response = Response(status=304)
+    else:
+        ingredient = request.args.get('ingredient', None)
+        response = Response(Drink.menu(form, ingredient), mimetype='application/json')
+
+    response.set_etag(etag)
+    response.last_modified = modified
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/drinks', methods=['POST'])
@@ -59,10 +107,14 @@ def post_drinks():
     payload = get_payload(request)
 
     check_valid_payload(payload)
-    check_unique_title(payload)
 
     drink = Drink(title=payload['title'], recipe=payload['recipe'])
-    drink.insert()
+    try:
+        drink.insert()
+    except exc.IntegrityError:
+        # the title is taken, the unique constraint is the only check
+        db.session.rollback()
+        abort(422)
 
     return jsonify({
         "success": True,
@@ -75,13 +127,16 @@ def post_drinks():
 def patch_drinks(drink_id):
     payload = get_payload(request)
 
-    check_drink_exist(drink_id)
+    drink = get_drink_or_404(drink_id)
     check_valid_payload(payload)
 
-    drink = Drink.query.get(drink_id)
     drink.title = payload['title']
     drink.recipe = payload['recipe']
-    drink.update()
+    try:
+        drink.update()
+    except exc.IntegrityError:
+        db.session.rollback()
+        abort(422)
 
     drinks = [drink.long()]
     return jsonify({
@@ -93,9 +148,7 @@ def patch_drinks(drink_id):
 @app.route('/drinks/<int:drink_id>', methods=['DELETE'])
 @requires_auth('delete:drinks')
 def delete_drinks(drink_id):
-    check_drink_exist(drink_id)
-
-    drink = Drink.query.get(drink_id)
+    drink = get_drink_or_404(drink_id)
     drink.delete()
 
     return jsonify({
@@ -109,9 +162,13 @@ def get_payload(request):
     new_title = body.get('title', None)
     new_recipe = body.get('recipe', None)
 
+    # a single ingredient may be sent on its own
+    if isinstance(new_recipe, dict):
+        new_recipe = [new_recipe]
+
     return {
         'title': new_title,
-        'recipe': json.dumps(new_recipe) if new_recipe is not None else None
+        'recipe': new_recipe
     }
 
 
@@ -119,15 +176,21 @@ def check_valid_payload(payload):
     if payload['title'] is None or payload['recipe'] is None:
         abort(400)
 
-
-def check_unique_title(payload):
-    if Drink.query.filter_by(title=payload['title']).count() > 0:
-        abort(422)
+    if not isinstance(payload['recipe'], list):
+        abort(400)
+    for ingredient in payload['recipe']:
+        if not isinstance(ingredient, dict) \
+                or not isinstance(ingredient.get('name'), str) \
+                or not isinstance(ingredient.get('color'), str) \
+                or not isinstance(ingredient.get('parts'), int) or isinstance(ingredient.get('parts'), bool):
+            abort(400)
 
 
-def check_drink_exist(drink_id):
-    if Drink.query.filter_by(id=drink_id).count() < 1:
+def get_drink_or_404(drink_id):
+    drink = Drink.query.get(drink_id)
+    if drink is None:
         abort(404)
+    return drink
 
 
 # Error Handling
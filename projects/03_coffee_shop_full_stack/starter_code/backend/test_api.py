@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+import unittest
+
+from jose import jwt
+from sqlalchemy import event
+
+# the app reads its database and signing key when imported
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'coffee_test.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DATABASE_FILE
+os.environ['AUTH_PUBLIC_KEY_FILE'] = os.path.join(TEST_DIR, 'test_keys', 'public.pem')
+
+from src.api import app  # noqa: E402
+from src.auth.auth import AUTH0_DOMAIN, API_AUDIENCE  # noqa: E402
+from src.database.models import db, db_drop_and_create_all, Drink  # noqa: E402
+
+LATTE = [{'name': 'milk', 'color': 'white', 'parts': 2}, {'name': 'coffee', 'color': 'brown', 'parts': 1}]
+
+
+def bearer(*permissions):
+    with open(os.path.join(TEST_DIR, 'test_keys', 'private.pem')) as pem:
+        private_key = pem.read()
+    token = jwt.encode({
+        'iss': 'https://{}/'.format(AUTH0_DOMAIN),
+        'aud': API_AUDIENCE,
+        'sub': 'auth0|manager',
+        'exp': int(time.time()) + 3600,
+        'permissions': list(permissions)
+    }, private_key, algorithm='RS256')
+    return {'Authorization': 'Bearer ' + token}
+
+
+class CoffeeShopTestCase(unittest.TestCase):
+    """This class represents the coffee shop test case, tokens are signed with test_keys"""
+
+    def setUp(self):
+        self.client = app.test_client
+        self.statements = []
+        with app.app_context():
+            db_drop_and_create_all()
+            Drink(title='latte', recipe=LATTE).insert()
+            db.session.remove()
+        event.listen(db.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split(None, 1)[0].upper())
+
+    def selects(self):
+        return self.statements.count('SELECT')
+
+    def test_when_post_drink_then_no_select(self):
+        res = self.client().post('/drinks', json={'title': 'mocha', 'recipe': LATTE},
+                                 headers=bearer('post:drinks'))
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual('mocha', res.get_json()['drinks'][0]['title'])
+        self.assertEqual(0, self.selects(), self.statements)
+
+    def test_when_post_duplicated_title_then_422(self):
+        res = self.client().post('/drinks', json={'title': 'latte', 'recipe': LATTE},
+                                 headers=bearer('post:drinks'))
+
+        self.assertEqual(422, res.status_code)
+
+    def test_when_patch_drink_then_one_select(self):
+        recipe = [{'name': 'oat milk', 'color': 'beige', 'parts': 3}]
+        res = self.client().patch('/drinks/1', json={'title': 'flat white', 'recipe': recipe},
+                                  headers=bearer('patch:drinks'))
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual([{'id': 1, 'title': 'flat white', 'recipe': [
+            {'color': 'beige', 'name': 'oat milk', 'parts': 3}]}], res.get_json()['drinks'])
+        self.assertEqual(1, self.selects(), self.statements)
+
+    def test_when_patch_to_taken_title_then_422_and_unchanged(self):
+        self.client().post('/drinks', json={'title': 'mocha', 'recipe': LATTE}, headers=bearer('post:drinks'))
+        res = self.client().patch('/drinks/1', json={'title': 'mocha', 'recipe': []},
+                                  headers=bearer('patch:drinks'))
+
+        self.assertEqual(422, res.status_code)
+        drinks = self.client().get('/drinks-detail', headers=bearer('get:drinks-detail')).get_json()['drinks']
+        self.assertEqual(('latte', 2), (drinks[0]['title'], len(drinks[0]['recipe'])))
+
+    def test_when_patch_missing_drink_then_404(self):
+        res = self.client().patch('/drinks/99', json={'title': 'mocha', 'recipe': LATTE},
+                                  headers=bearer('patch:drinks'))
+
+        self.assertEqual(404, res.status_code)
+
+    def test_when_delete_drink_then_one_select(self):
+        res = self.client().delete('/drinks/1', headers=bearer('delete:drinks'))
+
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(1, res.get_json()['delete'])
+        self.assertEqual(1, self.selects(), self.statements)
+        self.assertEqual([], self.client().get('/drinks').get_json()['drinks'])
+
+    def test_when_menu_unchanged_then_304_without_menu_query(self):
+        etag = self.client().get('/drinks').headers['ETag']
+        self.statements.clear()
+        res = self.client().get('/drinks', headers={'If-None-Match': etag})
+
+        self.assertEqual(304, res.status_code)
+        self.assertEqual(1, len(self.statements), self.statements)
+
+    def test_when_menu_written_then_etag_changes(self):
+        etag = self.client().get('/drinks').headers['ETag']
+        self.client().delete('/drinks/1', headers=bearer('delete:drinks'))
+        res = self.client().get('/drinks', headers={'If-None-Match': etag})
+
+        self.assertEqual(200, res.status_code)
+        self.assertNotEqual(etag, res.headers['ETag'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()